@@ -9,14 +9,14 @@ from bpy.types import PropertyGroup, Panel, Operator, UIList
 import bmesh
 from abc import ABC, abstractmethod
 from collections import defaultdict
-from .prefs import IO_AnnocfgPreferences
+from .prefs import IO_AnnocfgPreferences, clear_preference_cache
 from .utils import *
 from . import feedback_enums
 from . import helpstrings
 from .material import Material, ClothMaterial
 from .anno_objects import get_anno_object_class,anno_object_classes, set_anno_object_class, MainFile, Model, Cf7File, SubFile, Decal, Propcontainer, Prop, Particle, IfoPlane, Sequence, DummyGroup,\
     Cf7DummyGroup, Cf7Dummy, FeedbackConfig, SimpleAnnoFeedbackEncodingObject, ArbitraryXMLAnnoObject, Light, Cloth, IfoFile, Spline, IslandFile, PropGridInstance, \
-    IslandGamedataFile, GameObject, AnimationsNode, Animation, AnimationSequence, AnimationSequences, Track, TrackElement, IfoMeshHeightmap, NoAnnoObject, Dummy, BezierCurve, AssetsXML
+    IslandGamedataFile, GameObject, AnimationsNode, Animation, AnimationSequence, AnimationSequences, Track, TrackElement, IfoMeshHeightmap, NoAnnoObject, Dummy, BezierCurve, AssetsXML, select_as_active
 
 
 class XMLTooltip(Operator):
@@ -395,6 +395,7 @@ class PasteFromClipboardOperator(Operator):
     bl_label = "Import From Clipboard (Anno)"
     anno_object_by_enum = {str(cls):cls for cls in anno_object_classes}
     def execute(self, context):
+        clear_preference_cache()
         import itertools as IT
         # if not self.path.suffix == ".xml" or not self.path.exists():
         #     self.report({'ERROR_INVALID_INPUT'}, f"Invalid file or extension")
@@ -500,6 +501,7 @@ class ConvertToXML(Operator):
     bl_label = "Convert To XML"
 
     def execute(self, context):
+        clear_preference_cache()
         obj = context.active_object
         node = get_anno_object_class(obj).blender_to_xml(obj, None, None)
         ET.indent(node, space="\t", level=0)
@@ -531,7 +533,7 @@ class AddFeedbackDummy(Operator):
         dummy_obj = Dummy.xml_to_blender(node)
         dummy_obj.parent = obj
         dummy_obj.scale = (0.1, 0.1, 0.1)
-        bpy.context.view_layer.objects.active = dummy_obj
+        select_as_active(dummy_obj)
         return {'FINISHED'}
 
 class AddFeedbackGroup(Operator):
@@ -547,7 +549,7 @@ class AddFeedbackGroup(Operator):
         """)
         dummy_obj = DummyGroup.xml_to_blender(node)
         dummy_obj.parent = obj
-        bpy.context.view_layer.objects.active = dummy_obj
+        select_as_active(dummy_obj)
         return {'FINISHED'}
     
 class AddSimpleAnnoFeedback(Operator):
@@ -558,7 +560,7 @@ class AddSimpleAnnoFeedback(Operator):
         obj = context.active_object
         o = SimpleAnnoFeedbackEncodingObject().from_default()
         o.parent = obj
-        bpy.context.view_layer.objects.active = o
+        select_as_active(o)
         return {'FINISHED'}
     
 class AddFeedbackConfig(Operator):
@@ -569,7 +571,7 @@ class AddFeedbackConfig(Operator):
         obj = context.active_object
         feedback_obj = FeedbackConfig.from_default()
         feedback_obj.parent = obj
-        bpy.context.view_layer.objects.active = feedback_obj
+        select_as_active(feedback_obj)
         return {'FINISHED'}
 
 class AddFeedbackConfigFromGroup(Operator):
@@ -583,7 +585,7 @@ class AddFeedbackConfigFromGroup(Operator):
             return {"CANCELLED"}
         feedback_obj = FeedbackConfig.from_default()
         feedback_obj.parent = obj
-        bpy.context.view_layer.objects.active = feedback_obj
+        select_as_active(feedback_obj)
         feedback_obj.name = feedback_obj.name + group.name.replace("DummyGroup_", "")
         return {'FINISHED'}
 class FixDummyName(Operator):
@@ -748,15 +750,17 @@ class DuplicateAnnoObject(Operator):
     def fix_track_object_references(self, track_obj):
         node = track_obj.dynamic_properties.to_node(ET.Element("Track"))
         for track_node in node.findall("TrackElement"):
-            if track_node.find("BlenderModelID") is not None:
+            model_id_node = track_node.find("BlenderModelID")
+            if model_id_node is not None:
                 org_name = get_text(track_node, "BlenderModelID")
                 dup_name = self.original_to_duplicate[org_name]
-                track_node.find("BlenderModelID").text = dup_name
+                model_id_node.text = dup_name
             
-            if track_node.find("BlenderParticleID") is not None:
+            particle_id_node = track_node.find("BlenderParticleID")
+            if particle_id_node is not None:
                 org_name = get_text(track_node, "BlenderParticleID")
                 dup_name = self.original_to_duplicate[org_name]
-                track_node.find("BlenderParticleID").text = dup_name
+                particle_id_node.text = dup_name
         track_obj.dynamic_properties.reset()
         track_obj.dynamic_properties.from_node(node)
     
@@ -16,6 +16,7 @@ import bmesh
 import sys
 
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from math import radians
 from .prefs import IO_AnnocfgPreferences
 from .utils import *
@@ -23,12 +24,17 @@ from .transform import Transform
 from .material import Material, ClothMaterial
 from .feedback_ui import FeedbackConfigItem, GUIDVariationListItem, FeedbackSequenceListItem
 from . import feedback_enums
-# import numpy as np
+import numpy as np
+
+#Mesh and texture tags read from .prp files. Bytes, so that the files do not have to be decoded as a whole.
+PROP_FILE_TAG_PATTERN = re.compile(b"<(MeshFileName|cModelDiffTex|cPropDiffuseTex|cModelNormalTex|cPropNormalTex|cModelMetallicTex|cPropMetallicTex)>(.*?)<", re.I)
+#Names blender gives to enumerated materials of imported .glb files.
+ENUMERATED_MATERIAL_PATTERN = re.compile("Material_[0-9]+.*")
 
 def convert_to_glb(fullpath: Path):
     rdm4_path = IO_AnnocfgPreferences.get_path_to_rdm4()
     if rdm4_path.exists() and fullpath.exists():
-        subprocess.call(f"\"{rdm4_path}\" --input \"{fullpath}\" -n --outdst \"{fullpath.parent}\"", shell = True)
+        subprocess.call([str(rdm4_path), "--input", str(fullpath), "-n", "--outdst", str(fullpath.parent)])
 
 def convert_to_glb_if_required(data_path: Union[str, Path]):
     if data_path is None:
@@ -39,7 +45,8 @@ def convert_to_glb_if_required(data_path: Union[str, Path]):
         convert_to_glb(fullpath)
 
 def import_model_to_scene(data_path: Union[str, Path, None]) -> BlenderObject:
-    print(data_path)
+    if IO_AnnocfgPreferences.debug_output_enabled():
+        print(data_path)
     if not data_path:
         print("invalid data path")
         return add_empty_to_scene()
@@ -57,7 +64,8 @@ def import_model_to_scene(data_path: Union[str, Path, None]) -> BlenderObject:
     #     obj.select_set(False)
     ret = bpy.ops.import_scene.gltf(filepath=str(fullpath))
     obj = bpy.context.active_object
-    print(obj.name, obj.type)
+    if IO_AnnocfgPreferences.debug_output_enabled():
+        print(obj.name, obj.type)
     Transform.mirror_mesh(obj)
     return obj
 
@@ -66,11 +74,12 @@ def convert_animation_to_glb(model_fullpath, animation_fullpath: Path):
     rdm4_path = IO_AnnocfgPreferences.get_path_to_rdm4()
     if rdm4_path.exists() and animation_fullpath.exists() and model_fullpath.exists():
         out_filename = animation_fullpath.parent
-        subprocess.call(f"\"{rdm4_path}\" -i \"{model_fullpath}\" -sam \"{animation_fullpath}\" --force --outdst \"{out_filename}\"", shell = True)
+        subprocess.call([str(rdm4_path), "-i", str(model_fullpath), "-sam", str(animation_fullpath), "--force", "--outdst", str(out_filename)])
 
 
 def import_animated_model_to_scene(model_data_path: Union[str, Path, None], animation_data_path) -> BlenderObject:
-    print(model_data_path, animation_data_path)
+    if IO_AnnocfgPreferences.debug_output_enabled():
+        print(model_data_path, animation_data_path)
     if not model_data_path or not animation_data_path:
         print("Invalid data path for animation or model")
         return add_empty_to_scene()
@@ -96,10 +105,33 @@ def import_animated_model_to_scene(model_data_path: Union[str, Path, None], anim
         return None
     ret = bpy.ops.import_scene.gltf(filepath=str(combined_path))
     obj = bpy.context.active_object
-    print(obj.name, obj.type)
+    if IO_AnnocfgPreferences.debug_output_enabled():
+        print(obj.name, obj.type)
     Transform.mirror_mesh(obj)
     return obj
 
+def prefetch_cfg_files(root: ET.Element) -> None:
+    """Warms the OS page cache for the .glb models and .png textures referenced by a .cfg tree.
+    Textures without a .png are converted first, with one texconv call per folder.
+    The paths are resolved here because that needs bpy, only the reads happen in the thread pool.
+    """
+    fullpaths = []
+    dds_fullpaths = []
+    for file_name_node in root.iter("FileName"):
+        if file_name_node.text and file_name_node.text.lower().endswith(".rdm"):
+            fullpaths.append(data_path_to_absolute_path(file_name_node.text).with_suffix(".glb"))
+    suffix = IO_AnnocfgPreferences.get_texture_quality_suffix()
+    for texture_name in {**Material.texture_definitions, **ClothMaterial.texture_definitions}:
+        for texture_node in root.iter(texture_name):
+            if not texture_node.text:
+                continue
+            texture_path = Path(texture_node.text)
+            dds_path = Path(texture_path.parent, texture_path.stem + suffix + ".dds")
+            dds_fullpaths.append(data_path_to_absolute_path(dds_path))
+            fullpaths.append(data_path_to_absolute_path(dds_path.with_suffix(".png")))
+    Material.convert_to_png_batch(dds_fullpaths)
+    prefetch_files(fullpaths)
+
 def add_empty_to_scene(empty_type: str = "SINGLE_ARROW") -> BlenderObject:
     """Adds an empty of empty_type to the scene.
 
@@ -111,8 +143,39 @@ def add_empty_to_scene(empty_type: str = "SINGLE_ARROW") -> BlenderObject:
     Returns:
         BlenderObject: The empty object.
     """
-    bpy.ops.object.empty_add(type=empty_type, align='WORLD', location = (0,0,0), scale = (1,1,1))
-    obj = bpy.context.active_object
+    #Created through the data API, bpy.ops.object.empty_add would trigger a scene update per call.
+    obj = bpy.data.objects.new("Empty", None)
+    obj.empty_display_type = empty_type
+    bpy.context.collection.objects.link(obj)
+    return obj
+
+def select_as_active(obj: BlenderObject) -> None:
+    """Makes obj the only selected and the active object, like the bpy.ops add operators do for the objects they create.
+    Objects created through the data API are neither selected nor active.
+    """
+    for selected_obj in bpy.context.selected_objects:
+        selected_obj.select_set(False)
+    obj.select_set(True)
+    bpy.context.view_layer.objects.active = obj
+
+def add_cube_to_scene(size: float = 2.0) -> BlenderObject:
+    """Adds a cube mesh object with the given edge length to the scene, like bpy.ops.mesh.primitive_cube_add.
+
+    Args:
+        size (float, optional): Edge length. Defaults to 2.0.
+
+    Returns:
+        BlenderObject: The cube object.
+    """
+    #Created through the data API, the operator would trigger a scene update per call.
+    h = size / 2
+    vertices = [(x, y, z) for x in (-h, h) for y in (-h, h) for z in (-h, h)]
+    faces = [(0, 1, 3, 2), (4, 6, 7, 5), (0, 4, 5, 1), (2, 3, 7, 6), (0, 2, 6, 4), (1, 5, 7, 3)]
+    mesh = bpy.data.meshes.new("Cube")
+    mesh.from_pydata(vertices, [], faces)
+    mesh.update()
+    obj = bpy.data.objects.new("Cube", mesh)
+    bpy.context.collection.objects.link(obj)
     return obj
     
     
@@ -168,13 +231,18 @@ class AnnoObject(ABC):
     
     @classmethod
     def add_children_from_xml(cls, node, obj):
-        for subnode_name, subcls in cls.child_anno_object_types.items():
-            subnodes = node.find(subnode_name)
-            if subnodes is not None:
-                for i, subnode in enumerate(list(subnodes)):
-                    child_obj = subcls.xml_to_blender(subnode, obj)
-                    child_obj["import_index"] = i
-                node.remove(subnodes)
+        #One pass over the children with a lookup by tag instead of a find per container type.
+        #Like before, only the first container of each type is imported.
+        imported_containers = set()
+        for subnodes in list(node):
+            subcls = cls.child_anno_object_types.get(subnodes.tag)
+            if subcls is None or subnodes.tag in imported_containers:
+                continue
+            imported_containers.add(subnodes.tag)
+            for i, subnode in enumerate(list(subnodes)):
+                child_obj = subcls.xml_to_blender(subnode, obj)
+                child_obj["import_index"] = i
+            node.remove(subnodes)
         for subnode_name, subcls in cls.child_anno_object_types_without_container.items():
             if subcls == AnimationSequences and not IO_AnnocfgPreferences.turn_sequences_into_blender_objects():
                 continue
@@ -206,15 +274,17 @@ class AnnoObject(ABC):
             
         if cls.has_transform:
             transform_node = node
-            if "base_path" in cls.transform_paths and node.find(cls.transform_paths["base_path"]) is not None:
-                transform_node = node.find(cls.transform_paths["base_path"])
+            if "base_path" in cls.transform_paths:
+                base_node = node.find(cls.transform_paths["base_path"])
+                if base_node is not None:
+                    transform_node = base_node
             transform = Transform.from_node(transform_node, cls.transform_paths, cls.enforce_equal_scale, cls.has_euler_rotation)
             transform.apply_to(obj)
 
         if cls.has_materials:
             materials = []
-            if node.find("Materials") is not None:
-                materials_node = node.find("Materials")
+            materials_node = node.find("Materials")
+            if materials_node is not None:
                 for material_node in list(materials_node):
                     material = cls.material_class.from_material_node(material_node)
                     materials.append(material)
@@ -350,7 +420,7 @@ class AnnoObject(ABC):
         if not obj.data:
             #or not obj.data.materials:
             return
-        if len(materials) > 1 and all([bool(re.match( "Material_[0-9]+.*",m.name)) for m in obj.data.materials]):
+        if len(materials) > 1 and all([bool(ENUMERATED_MATERIAL_PATTERN.match(m.name)) for m in obj.data.materials]):
             sorted_materials = sorted([mat.name for i, mat in enumerate(obj.data.materials)])
             if sorted_materials != [mat.name for mat in obj.data.materials]:
                 
@@ -458,26 +528,21 @@ class Track(AnnoObject):
         return name
     @classmethod
     def node_to_property_node(self, node, obj):
+        main_file = obj.parent.parent.parent
+        #obj.children walks all objects, so resolve the names once for all track elements.
+        model_names = names_by_import_index(main_file, Model)
+        particle_names = names_by_import_index(main_file, Particle)
         for track_node in node.findall("TrackElement"):
             if get_text(track_node, "Type", "-1") not in  ["0", "1"]:
                 continue
             model_id = int(get_text(track_node, "ModelID", "-1"))
-            main_file = obj.parent.parent.parent
-            for o in main_file.children:
-                if get_anno_object_class(o) != Model:
-                    continue
-                if o["import_index"] == model_id:
-                    model_name = o.name
-                    track_node.remove(track_node.find("ModelID"))
-                    ET.SubElement(track_node, "BlenderModelID").text = model_name
+            if model_id in model_names:
+                track_node.remove(track_node.find("ModelID"))
+                ET.SubElement(track_node, "BlenderModelID").text = model_names[model_id]
             particle_id = int(get_text(track_node, "ParticleID", "-1"))
-            for o in main_file.children:
-                if get_anno_object_class(o) != Particle:
-                    continue
-                if o["import_index"] == particle_id:
-                    particle_name = o.name
-                    track_node.remove(track_node.find("ParticleID"))
-                    ET.SubElement(track_node, "BlenderParticleID").text = particle_name
+            if particle_id in particle_names:
+                track_node.remove(track_node.find("ParticleID"))
+                ET.SubElement(track_node, "BlenderParticleID").text = particle_names[particle_id]
         return node
     
 class AnimationSequence(AnnoObject):
@@ -561,9 +626,7 @@ class Model(AnnoObject):
         data_path = get_text(node, "FileName")
         imported_obj = import_model_to_scene(data_path)
         if imported_obj is None:
-            bpy.ops.mesh.primitive_cube_add(size = 0.1, location=(0,0,0))
-            obj = bpy.context.active_object
-            return obj
+            return add_cube_to_scene(size = 0.1)
         return imported_obj
     
     @classmethod
@@ -703,7 +766,7 @@ class SubFile(AnnoObject):
         file_obj = MainFile.xml_to_blender(root)
         file_obj.name = "MAIN_FILE_" + fullpath.name
         
-        if random.random() < IO_AnnocfgPreferences.cfg_cache_probability():
+        if IO_AnnocfgPreferences.should_cache_cfg():
             cls.cache_to_library(file_obj, data_path)
         return file_obj
     
@@ -735,12 +798,15 @@ class Decal(AnnoObject):
 
     @classmethod
     def add_blender_object_to_scene(cls, node) -> BlenderObject:
-        bpy.ops.mesh.primitive_plane_add(size=2, enter_editmode=False, align='WORLD', location=(0,0,0), scale=(1,1,1))
-
-        obj = bpy.context.active_object
-        for v in obj.data.vertices:
-            v.co.y *= -1.0
-            v.co.x *= -1.0
+        #The plane of bpy.ops.mesh.primitive_plane_add(size=2) with x and y mirrored, built through the data API
+        #to skip the operator's undo push and scene update per decal. The uvs are those of the operator's plane.
+        mesh = bpy.data.meshes.new("Plane")
+        mesh.from_pydata([(1, 1, 0), (-1, 1, 0), (1, -1, 0), (-1, -1, 0)], [], [(0, 1, 3, 2)])
+        uv_layer = mesh.uv_layers.new(name = "UVMap")
+        uv_layer.data.foreach_set("uv", (0, 0, 1, 0, 1, 1, 0, 1))
+        mesh.update()
+        obj = bpy.data.objects.new("Plane", mesh)
+        bpy.context.collection.objects.link(obj)
         return obj   
     
     @classmethod
@@ -782,27 +848,71 @@ class Prop(AnnoObject):
         """
         if prop_filename in cls.prop_data_by_filename:
             return cls.prop_data_by_filename[prop_filename]
-        prop_file = data_path_to_absolute_path(prop_filename)
-        if not prop_file.exists() or prop_file.suffix != ".prp":
-            return (None, None)
-        with open(prop_file) as file:
-            content = file.read()
-            mesh_file_name = re.findall("<MeshFileName>(.*?)<", content, re.I)[0]
-            diff_path = get_first_or_none(re.findall("<cModelDiffTex>(.*?)<", content, re.I))
-            #Some props (trees) do seem to have a cProp texture. Let's just deal with that.
-            if diff_path is None:
-                diff_path = get_first_or_none(re.findall("<cPropDiffuseTex>(.*?)<", content, re.I))
-            norm_path = get_first_or_none(re.findall("<cModelNormalTex>(.*?)<", content, re.I))
-            if norm_path is None:
-                norm_path = get_first_or_none(re.findall("<cPropNormalTex>(.*?)<", content, re.I))
-            metallic_path = get_first_or_none(re.findall("<cModelMetallicTex>(.*?)<", content, re.I))
-            if metallic_path is None:
-                metallic_path = get_first_or_none(re.findall("<cPropMetallicTex>(.*?)<", content, re.I))
-            material = Material.from_filepaths(prop_filename, diff_path, norm_path, metallic_path)
-        prop_data = (mesh_file_name, material)
+        prop_data = cls.read_prop_file(prop_filename, data_path_to_absolute_path(prop_filename))
         cls.prop_data_by_filename[prop_filename] = prop_data
         return prop_data
     
+    @classmethod
+    def read_prop_file(cls, prop_filename: str, prop_file: Path) -> Tuple[Optional[str], Optional[Material]]:
+        """Parses a .prp file. Does not access bpy, so it can run outside of the main thread.
+
+        Args:
+            prop_filename (str): Data path of the .prp file, used as material name.
+            prop_file (Path): Absolute path of the .prp file.
+
+        Returns:
+            Tuple[str, Material]: Path to the .rdm file of the prop and its material.
+        """
+        if prop_file.suffix != ".prp":
+            return (None, None)
+        #Reading directly instead of checking exists() first saves a stat call per prop.
+        try:
+            content = prop_file.read_bytes()
+        except OSError:
+            return (None, None)
+        #First value of each tag, keyed by the lower case tag name.
+        values = {}
+        for tag, value in PROP_FILE_TAG_PATTERN.findall(content):
+            tag = tag.decode().lower()
+            if tag not in values:
+                values[tag] = value.decode()
+        mesh_file_name = values.get("meshfilename")
+        #Some props (trees) do seem to have a cProp texture. Let's just deal with that.
+        diff_path = values.get("cmodeldifftex", values.get("cpropdiffusetex"))
+        norm_path = values.get("cmodelnormaltex", values.get("cpropnormaltex"))
+        metallic_path = values.get("cmodelmetallictex", values.get("cpropmetallictex"))
+        material = Material.from_filepaths(prop_filename, diff_path, norm_path, metallic_path)
+        return (mesh_file_name, material)
+    
+    @classmethod
+    def has_model(cls, prop_filename: str) -> bool:
+        """Checks if the prop references a model file that exists, without creating any blender data."""
+        model_filename, _ = cls.get_prop_data(prop_filename)
+        if not model_filename:
+            return False
+        fullpath = data_path_to_absolute_path(model_filename)
+        return fullpath.exists() or fullpath.with_suffix(".glb").exists()
+    
+    @classmethod
+    def preload_prop_data(cls, prop_filenames: List[str]):
+        """Reads the given .prp files in a thread pool and stores the results in prop_data_by_filename.
+        The paths are resolved on the calling thread, because that needs bpy.
+        Files that cannot be parsed are skipped and fail later in get_prop_data like before.
+        """
+        prop_files = {}
+        for prop_filename in prop_filenames:
+            if prop_filename not in cls.prop_data_by_filename:
+                prop_files[prop_filename] = data_path_to_absolute_path(prop_filename)
+        def read(item):
+            try:
+                return item[0], cls.read_prop_file(*item)
+            except Exception:
+                return item[0], None
+        with ThreadPoolExecutor(max_workers = os.cpu_count()) as executor:
+            for prop_filename, prop_data in executor.map(read, prop_files.items()):
+                if prop_data is not None:
+                    cls.prop_data_by_filename[prop_filename] = prop_data
+    
     @classmethod
     def add_blender_object_to_scene(cls, node) -> BlenderObject:
         prop_filename = get_text(node, "FileName")
@@ -883,8 +993,11 @@ class Light(AnnoObject):
         return property_node 
     @classmethod
     def add_blender_object_to_scene(cls, node) -> BlenderObject:
-        bpy.ops.object.light_add(type='POINT', radius=1)
-        obj = bpy.context.active_object
+        #Created through the data API, like bpy.ops.object.light_add(type='POINT', radius=1) without the scene update.
+        light = bpy.data.lights.new("Point", type = 'POINT')
+        light.shadow_soft_size = 1.0
+        obj = bpy.data.objects.new("Point", light)
+        bpy.context.collection.objects.link(obj)
         return obj
   
     
@@ -975,8 +1088,7 @@ class IfoCube(AnnoObject):
     
     @classmethod
     def add_blender_object_to_scene(cls, node) -> BlenderObject:
-        bpy.ops.mesh.primitive_cube_add(location=(0,0,0))
-        obj = bpy.context.active_object
+        obj = add_cube_to_scene()
         obj.display_type = 'WIRE'
         return obj
 
@@ -1021,12 +1133,17 @@ class IfoPlane(AnnoObject):
     @classmethod 
     def blender_to_xml(cls, obj, parent_node, child_map):
         node = super().blender_to_xml(obj, parent_node, child_map)
-        for vert in obj.data.vertices:
-            coords = obj.matrix_local @ vert.co
-            x = coords.x
-            if IO_AnnocfgPreferences.mirror_models():
-                x *= -1
-            y = -coords.y
+        #Read and transform all vertices at once instead of one matrix multiplication per vertex.
+        vertex_count = len(obj.data.vertices)
+        co = np.empty(vertex_count * 3, dtype=np.float32)
+        obj.data.vertices.foreach_get("co", co)
+        matrix = np.array(obj.matrix_local, dtype=np.float64)
+        coords = co.reshape(vertex_count, 3) @ matrix[:3, :3].T + matrix[:3, 3]
+        xs = coords[:, 0]
+        if IO_AnnocfgPreferences.mirror_models():
+            xs = -xs
+        ys = -coords[:, 1]
+        for x, y in zip(xs.tolist(), ys.tolist()):
             position_node = ET.SubElement(node, "Position")
             if node.tag == "BuildBlocker":
                 x = float(round(x*2)) / 2
@@ -1047,7 +1164,8 @@ class IfoMeshHeightmap(AnnoObject):
         stepy = float(get_text(node, "StepSize/y"))
         width = int(get_text(node, "Heightmap/Width"))
         height = int(get_text(node, "Heightmap/Height"))
-        heightdata = [float(s.text) for s in node.findall("Heightmap/Map/i")]
+        #numpy converts the strings to floats in C, one python float() per value is slow for large heightmaps.
+        heightdata = np.array([s.text for s in node.findall("Heightmap/Map/i")], dtype=np.float64)
         node.find("Heightmap").remove(node.find("Heightmap/Map"))
         print(f"Heightmap w={width} x h={height} => {len(heightdata)}")
         
@@ -1056,25 +1174,25 @@ class IfoMeshHeightmap(AnnoObject):
         col = bpy.data.collections.get("Collection")
         col.objects.link(obj)
         bpy.context.view_layer.objects.active = obj
-        verts = []
-        i = 0
-        for a in range(height):
-            for b in range(width):
-                verts.append((startx + b * stepx, starty + a * stepy, heightdata[i]))
-                i += 1
-
-        mesh.from_pydata(verts, [], [])
-        for i, vert in enumerate(obj.data.vertices):
-            vert.co.y *= -1
-            vert.co.x *= -1
+        #Vertex a * width + b lies at (startx + b * stepx, starty + a * stepy), mirrored in x and y.
+        ys, xs = np.meshgrid(starty + np.arange(height) * stepy, startx + np.arange(width) * stepx, indexing = "ij")
+        verts = np.empty((height * width, 3), dtype=np.float32)
+        verts[:, 0] = -xs.ravel()
+        verts[:, 1] = -ys.ravel()
+        verts[:, 2] = heightdata[:height * width]
+
+        mesh.vertices.add(height * width)
+        mesh.vertices.foreach_set("co", verts.ravel())
+        mesh.update()
         return obj
 
     @classmethod 
     def blender_to_xml(cls, obj, parent_node, child_map):
         node = super().blender_to_xml(obj, parent_node, child_map)
         map_node = ET.SubElement(node.find("Heightmap"), "Map")
-        for vert in obj.data.vertices:
-            z = vert.co.z
+        co = np.empty(len(obj.data.vertices) * 3, dtype=np.float32)
+        obj.data.vertices.foreach_get("co", co)
+        for z in co[2::3].tolist():
             ET.SubElement(map_node, "i").text = format_float(z)
         return node
 
@@ -1363,16 +1481,18 @@ class Cf7File(AnnoObject):
     }   
     @classmethod
     def add_children_from_xml(cls, node, obj):
-        if not node.find("DummyRoot/Groups"):
+        groups_node = node.find("DummyRoot/Groups")
+        if not groups_node:
             return
-        for group_node in list(node.find("DummyRoot/Groups")):
+        for group_node in list(groups_node):
             Cf7DummyGroup.xml_to_blender(group_node, obj)
-            node.find("DummyRoot/Groups").remove(group_node)
+            groups_node.remove(group_node)
         if not IO_AnnocfgPreferences.splines_enabled():
             return
+        spline_data_node = node.find("SplineData")
         for spline_data in list(node.findall("SplineData/v")):
             Spline.xml_to_blender(spline_data, obj)
-            node.find("SplineData").remove(spline_data)
+            spline_data_node.remove(spline_data)
     @classmethod
     def add_children_from_obj(cls, obj, node, child_map):
         dummy_groups_node = find_or_create(node, "DummyRoot/Groups")
@@ -1405,14 +1525,23 @@ class Spline(AnnoObject):
     
     @classmethod
     def add_blender_object_to_scene(cls, node) -> BlenderObject:
-        bpy.ops.curve.primitive_bezier_curve_add()
-
-        obj = bpy.context.active_object
-        spline = obj.data.splines[0]
+        #Created through the data API instead of bpy.ops.curve.primitive_bezier_curve_add, which triggers a scene update.
+        curve = bpy.data.curves.new("BezierCurve", type = 'CURVE')
+        curve.dimensions = '3D'
+        spline = curve.splines.new('BEZIER')
+        obj = bpy.data.objects.new("BezierCurve", curve)
+        bpy.context.collection.objects.link(obj)
         control_points = node.find("ControlPoints")
         if control_points is None:
+            #The two point curve of the operator.
+            spline.bezier_points.add(1)
+            for bezier_point, x in zip(spline.bezier_points, (-1.0, 1.0)):
+                bezier_point.co = (x, 0.0, 0.0)
+                bezier_point.handle_left_type = "AUTO"
+                bezier_point.handle_right_type = "AUTO"
             return obj
-        spline.bezier_points.add(len(control_points)-2)
+        #A new spline starts with one point.
+        spline.bezier_points.add(len(control_points)-1)
         for i, control_point_node in enumerate(control_points):
             x = get_float(control_point_node, "x")
             y = get_float(control_point_node, "y")
@@ -1567,14 +1696,27 @@ class PropGridInstance:
         
         set_anno_object_class(obj, cls)
         
-        location = [float(s) for s in get_text_and_delete(node, "Position", "0,0 0,0 0,0").replace(",", ".").split(" ")]
-        rotation = [float(s) for s in get_text_and_delete(node, "Rotation", "1,0 0,0 0,0 0,0").replace(",", ".").split(" ")]
+        #Islands have thousands of instances, so take the transform children from one pass over the node.
+        children_by_tag = {}
+        for child in reversed(node):
+            children_by_tag[child.tag] = child
+        def take_text(tag, default_value):
+            child = children_by_tag.get(tag)
+            if child is None:
+                return default_value
+            node.remove(child)
+            if child.text is None:
+                return default_value
+            return child.text
+        location = [float(s) for s in take_text("Position", "0,0 0,0 0,0").replace(",", ".").split(" ")]
+        rotation = [float(s) for s in take_text("Rotation", "1,0 0,0 0,0 0,0").replace(",", ".").split(" ")]
         rotation = [rotation[3], rotation[0], rotation[1], rotation[2]] #xzyw -> wxzy
         #rotation = [rotation[1], rotation[2], rotation[3], rotation[0]] #xzyw -> wxzy or something else
-        scale    = [float(s) for s in get_text_and_delete(node, "Scale", "1,0 1,0 1,0").replace(",", ".").split(" ")]
+        scale    = [float(s) for s in take_text("Scale", "1,0 1,0 1,0").replace(",", ".").split(" ")]
         
-        if node.find("AdaptTerrainHeight") is not None:
-            node.find("AdaptTerrainHeight").text = str(int(cls.str_to_bool(node.find("AdaptTerrainHeight").text)))
+        adapt_terrain_height_node = children_by_tag.get("AdaptTerrainHeight")
+        if adapt_terrain_height_node is not None:
+            adapt_terrain_height_node.text = str(int(cls.str_to_bool(adapt_terrain_height_node.text)))
         else:
             ET.SubElement(node, "AdaptTerrainHeight").text = "0"
         transform = Transform(location, rotation, scale, anno_coords = True)
@@ -1591,8 +1733,9 @@ class PropGridInstance:
         
         ET.SubElement(node, "FileName").text = get_text(base_node, "FileName")
         ET.SubElement(node, "Color").text = get_text(base_node, "Color", "1 1 1 1")
-        if base_node.find("AdaptTerrainHeight") is not None:
-            adapt = bool(int(get_text(base_node, "AdaptTerrainHeight")))
+        adapt_terrain_height_node = base_node.find("AdaptTerrainHeight")
+        if adapt_terrain_height_node is not None:
+            adapt = bool(int(adapt_terrain_height_node.text or ""))
             ET.SubElement(node, "AdaptTerrainHeight").text = str(adapt)
         else:
             adapt = bool(int(get_text(base_node, "Flags")))
@@ -1622,8 +1765,9 @@ class IslandFile:
         base_node = ET.fromstring(obj["islandxml"])
         
         prop_grid_node = base_node.find("PropGrid")
-        if prop_grid_node.find("Instances"): #delete existing
-            prop_grid_node.remove(prop_grid_node.find("Instances"))
+        old_instances_node = prop_grid_node.find("Instances")
+        if old_instances_node: #delete existing
+            prop_grid_node.remove(old_instances_node)
         instances_node = ET.SubElement(prop_grid_node, "Instances")
         
         index_by_filename = {}
@@ -1642,11 +1786,13 @@ class IslandFile:
             ET.SubElement(prop_node, "Index").text = str(index_by_filename[file_name])
             instances_node.append(prop_node)
             
-        if prop_grid_node.find("FileNames"): #delete existing
-            prop_grid_node.remove(prop_grid_node.find("FileNames"))
+        old_filenames_node = prop_grid_node.find("FileNames")
+        if old_filenames_node: #delete existing
+            prop_grid_node.remove(old_filenames_node)
         filenames_node = ET.SubElement(prop_grid_node, "FileNames")
         
-        print(index_by_filename.items())
+        if IO_AnnocfgPreferences.debug_output_enabled():
+            print(index_by_filename.items())
         for filename, index in sorted(index_by_filename.items(), key = lambda kv: kv[1]):
             ET.SubElement(filenames_node, "None").text = filename
         
@@ -2224,9 +2370,11 @@ class IslandGamedataFile:
         #create_maps(node)
         
         objects_nodes = node.findall("./GameSessionManager/AreaManagerData/None/Data/Content/AreaObjectManager/GameObject/objects")
+        debug_output = IO_AnnocfgPreferences.debug_output_enabled()
         for c, objects_node in enumerate(objects_nodes):
             for i, obj_node in enumerate(objects_node):
-                print(f"Container {c+1} / {len(objects_nodes)}; Object {i+1} / {len(objects_node)},")
+                if debug_output:
+                    print(f"Container {c+1} / {len(objects_nodes)}; Object {i+1} / {len(objects_node)},")
                 GameObject.xml_to_blender(obj_node, assetsXML)
     
     @classmethod
@@ -2273,6 +2421,12 @@ def get_anno_object_class(obj) -> type:
 
 def set_anno_object_class(obj, cls: type):
      obj.anno_object_class_str = cls.__name__
+
+def names_by_import_index(main_file, cls: type) -> Dict[int, str]:
+    """Names of the children of main_file with the given anno object class by their import_index.
+    Used to resolve ModelID and ParticleID references with one pass over main_file.children.
+    """
+    return {o.get("import_index"): o.name for o in main_file.children if get_anno_object_class(o) == cls}
     
     
     
@@ -3,6 +3,7 @@ from bpy.props import StringProperty, IntProperty, CollectionProperty, PointerPr
 from bpy.types import PropertyGroup, UIList, Operator, Panel
 from . import feedback_enums
 from .utils import data_path_to_absolute_path, to_data_path, get_text
+from .prefs import clear_preference_cache
 import xml.etree.ElementTree as ET
 from . import anno_objects
 import random
@@ -351,6 +352,7 @@ class FEEDBACK_OT_LoadFeedbackUnit(Operator):
     bl_label = "Loads one of the GuidVariation cfgs. Can be used to visualize the feedback. No effect in game."
 
     def execute(self, context):
+        clear_preference_cache()
         obj = context.active_object
         guid_list = obj.feedback_guid_list
         if len(guid_list) == 0:
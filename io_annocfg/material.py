@@ -9,9 +9,13 @@ import sys
 import os
 import subprocess
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from .prefs import IO_AnnocfgPreferences
 from .utils import *
 
+#Maximum number of .dds files passed to one texconv call.
+TEXCONV_BATCH_SIZE = 32
+
 
 class Material:
     """
@@ -54,6 +58,12 @@ class Material:
         "cWindRippleMeshIntensity":"", "DisableReviveDistance":"", "cGlossinessFactor":"", "cOpacity":"",
     }
     materialCache: Dict[Tuple[Any,...], Material] = {}
+    #Loaded images by (texture path, quality suffix). Cleared when an import starts, like the resolved paths.
+    texture_cache: Dict[Tuple[str, str], Any] = {}
+    #Data paths of exported images, see image_data_path.
+    image_data_path_cache: Dict[Tuple[str, str, str], Path] = {}
+    #Name of the material that as_blender_material copies, see get_template_material. The leading dot hides it in most material lists.
+    template_material_name = ".AnnoMaterialTemplate"
 
     def __init__(self):
         self.textures: Dict[str, str] = {}
@@ -67,7 +77,8 @@ class Material:
         instance = cls()
         instance.name = get_text_and_delete(material_node, "Name", "Unnamed Material")
         for texture_name, texture_enabled_flag in cls.texture_definitions.items():
-            texture_path = get_text_and_delete(material_node, texture_name)
+            #Interned, so that hashing and comparing the cache keys of materials sharing textures is cheap.
+            texture_path = sys.intern(get_text_and_delete(material_node, texture_name))
             instance.textures[texture_name] = texture_path
             instance.texture_enabled[texture_name] = bool(int(get_text(material_node, texture_enabled_flag, "0")))
         for color_name in cls.color_definitions:
@@ -105,6 +116,19 @@ class Material:
         """)
         return cls.from_material_node(element)
          
+    @classmethod
+    def image_data_path(cls, image) -> Path:
+        """Data path of the image file. Cached, because resolving the real path touches the file system
+        and materials share most of their images. The cache is cleared when a .cfg export starts.
+        """
+        cache_key = (image.name_full, image.filepath, bpy.data.filepath)
+        data_path = Material.image_data_path_cache.get(cache_key)
+        if data_path is None:
+            filepath_full = os.path.realpath(bpy.path.abspath(image.filepath, library=image.library))
+            data_path = to_data_path(filepath_full)
+            Material.image_data_path_cache[cache_key] = data_path
+        return data_path
+    
     @classmethod
     def from_blender_material(cls, blender_material) -> Material:
         instance = cls()
@@ -116,8 +140,7 @@ class Material:
                 instance.textures[texture_name] = ""
                 instance.texture_enabled[texture_name] = shader_node.anno_properties.enabled
                 continue
-            filepath_full = os.path.realpath(bpy.path.abspath(shader_node.image.filepath, library=shader_node.image.library))
-            texture_path = to_data_path(filepath_full)
+            texture_path = cls.image_data_path(shader_node.image)
             #Rename "data/.../some_diff_0.png" to "data/.../some_diff.psd"
             extension = shader_node.anno_properties.original_file_extension
             texture_path = Path(texture_path.as_posix().replace(instance.texture_quality_suffix()+".", ".")).with_suffix(extension)
@@ -139,7 +162,7 @@ class Material:
         return instance
     
     def texture_quality_suffix(self):
-        return "_"+IO_AnnocfgPreferences.get_texture_quality()
+        return IO_AnnocfgPreferences.get_texture_quality_suffix()
     
     def to_xml_node(self, parent: ET.Element) -> ET.Element:
         node = self.node
@@ -156,9 +179,17 @@ class Material:
             ET.SubElement(node, color_name + ".r").text = format_float(self.colors[color_name][0])
             ET.SubElement(node, color_name + ".g").text = format_float(self.colors[color_name][1])
             ET.SubElement(node, color_name + ".b").text = format_float(self.colors[color_name][2])
+        #Index the children once instead of a find_or_create per flag over the node's many property children.
+        children_by_tag = {}
+        for child in reversed(node):
+            children_by_tag[child.tag] = child
         for texture_name, texture_enabled_flag in self.texture_definitions.items():
             used_value = self.texture_enabled[texture_name]
-            find_or_create(node, texture_enabled_flag).text = str(int(used_value))
+            flag_node = children_by_tag.get(texture_enabled_flag)
+            if flag_node is None:
+                flag_node = ET.SubElement(node, texture_enabled_flag)
+                children_by_tag[texture_enabled_flag] = flag_node
+            flag_node.text = str(int(used_value))
         for prop, value in self.custom_properties.items():
             if value == "":
                 continue
@@ -181,11 +212,41 @@ class Material:
         if not fullpath.exists():
             return False
         try:
-            subprocess.call(f"\"{IO_AnnocfgPreferences.get_path_to_texconv()}\" -ft PNG -sepalpha -y -o \"{fullpath.parent}\" \"{fullpath}\"")
+            subprocess.call([str(IO_AnnocfgPreferences.get_path_to_texconv()), "-ft", "PNG", "-sepalpha", "-y", "-o", str(fullpath.parent), str(fullpath)])
         except:
             return False
         return fullpath.with_suffix(".png").exists()
     
+    @classmethod
+    def convert_to_png_batch(cls, fullpaths: List[Path]):
+        """Converts the .dds files that have no .png yet with one texconv call per folder,
+        so that get_texture does not start a process for every texture. The calls for different folders run in parallel.
+
+        Args:
+            fullpaths (List[Path]): .dds files
+        """
+        texconv_path = IO_AnnocfgPreferences.get_path_to_texconv()
+        if not texconv_path.exists():
+            return
+        fullpaths_by_folder = defaultdict(list)
+        for fullpath in set(fullpaths):
+            if fullpath.exists() and not fullpath.with_suffix(".png").exists():
+                fullpaths_by_folder[fullpath.parent].append(str(fullpath))
+        commands = []
+        for folder, folder_fullpaths in fullpaths_by_folder.items():
+            #Batches keep the command line below the windows length limit.
+            for i in range(0, len(folder_fullpaths), TEXCONV_BATCH_SIZE):
+                commands.append([str(texconv_path), "-ft", "PNG", "-sepalpha", "-y", "-o", str(folder)] + folder_fullpaths[i:i + TEXCONV_BATCH_SIZE])
+        def convert(command):
+            try:
+                subprocess.call(command)
+            except OSError:
+                print("Failed to convert textures in", command[7])
+        #The threads only wait for the texconv processes.
+        with ThreadPoolExecutor(max_workers = os.cpu_count()) as executor:
+            for _ in executor.map(convert, commands):
+                pass
+    
     def get_texture(self, texture_path: Path):
         """Tries to find the texture texture_path with ending "_0.png" (quality setting can be changed) in the list of loaded textures.
         Otherwise loads it. If it is not existing but the corresponding .dds exists, converts it first.
@@ -198,8 +259,37 @@ class Material:
         """
         if texture_path == Path(""):
             return None
-        texture_path = Path(texture_path)
-        texture_path = Path(texture_path.parent, texture_path.stem + self.texture_quality_suffix()+".dds")
+        cache_key = (str(texture_path), self.texture_quality_suffix())
+        image = Material.texture_cache.get(cache_key)
+        if image is not None:
+            try:
+                image.name
+                return image
+            except ReferenceError: #Removed from bpy.data since it was cached.
+                del Material.texture_cache[cache_key]
+        image = self.load_texture(Path(texture_path))
+        if image is not None:
+            Material.texture_cache[cache_key] = image
+        return image
+    
+    def quality_texture_path(self, texture_path: Path) -> Path:
+        """Data path of the .dds file of the texture in the selected texture quality."""
+        return Path(texture_path.parent, texture_path.stem + self.texture_quality_suffix()+".dds")
+    
+    def texture_fullpaths(self) -> List[Path]:
+        """Absolute paths of the .dds and .png files that get_texture loads for this material."""
+        fullpaths = []
+        for texture_path in self.textures.values():
+            if not texture_path:
+                continue
+            dds_path = self.quality_texture_path(Path(texture_path))
+            fullpaths.append(data_path_to_absolute_path(dds_path))
+            fullpaths.append(data_path_to_absolute_path(dds_path.with_suffix(".png")))
+        return fullpaths
+    
+    def load_texture(self, texture_path: Path):
+        """Uncached part of get_texture."""
+        texture_path = self.quality_texture_path(texture_path)
         png_file = texture_path.with_suffix(".png")
         fullpath = data_path_to_absolute_path(texture_path)
         png_fullpath = data_path_to_absolute_path(png_file)
@@ -472,14 +562,30 @@ class Material:
         group.node_tree = bpy.data.node_groups["AnnoShader"]
         return group
         
-    def as_blender_material(self):
-
-        if self.get_material_cache_key() in Material.materialCache:
-            return Material.materialCache[self.get_material_cache_key()]
-        
-        material = bpy.data.materials.new(name=self.name)
-        
-        material.dynamic_properties.from_node(self.node)
+    def is_valid_template_material(self, template) -> bool:
+        """Checks that the template has all nodes that as_blender_material accesses by name."""
+        if template.node_tree is None:
+            return False
+        nodes = template.node_tree.nodes
+        return all(name in nodes for name in self.texture_definitions.keys()) and all(name in nodes for name in self.color_definitions)
+    
+    def get_template_material(self):
+        """Returns the material with the shader node graph shared by all materials of this class and creates it if necessary.
+        Copying it is done in C, which is much faster than building the nodes for every material.
+        """
+        template = bpy.data.materials.get(self.template_material_name)
+        if template is not None:
+            if self.is_valid_template_material(template):
+                return template
+            #From an older version of the addon, appended from another file or edited by the user.
+            print("Warning: Rebuilding the outdated material template", template.name)
+            if template.users > int(template.use_fake_user):
+                template.name = template.name + "_outdated"
+            else:
+                bpy.data.materials.remove(template)
+        material = bpy.data.materials.new(name=self.template_material_name)
+        #The template has no users, without the fake user it would be lost when the file is saved.
+        material.use_fake_user = True
         material.use_nodes = True
         
         positioning_unit = (300, 300)
@@ -488,24 +594,10 @@ class Material:
         
         for i, texture_name in enumerate(self.texture_definitions.keys()):
             texture_node = material.node_tree.nodes.new('ShaderNodeTexImage')
-            texture_path = Path(self.textures[texture_name])
-            texture = self.get_texture(texture_path)
-            if texture is not None:
-                texture_node.image = texture
-                if "Norm" in texture_name or "Metal" in texture_name or "Height" in texture_name:
-                    texture_node.image.colorspace_settings.name = 'Non-Color'
             texture_node.name = texture_name
             texture_node.label = texture_name
             texture_node.location.x -= 4 * positioning_unit[0] - positioning_offset[0]
             texture_node.location.y -= i * positioning_unit[1] - positioning_offset[1]
-
-            texture_node.anno_properties.enabled = self.texture_enabled[texture_name]
-            extension = texture_path.suffix
-            if extension not in [".png", ".psd"]:
-                if texture_path != Path(""):
-                    print("Warning: Unsupported texture file extension", extension, texture_path)
-                extension = ".psd"
-            texture_node.anno_properties.original_file_extension = extension
         
         node_tree = material.node_tree
         links = node_tree.links
@@ -517,21 +609,13 @@ class Material:
         emissive_color = self.add_shader_node(node_tree, "ShaderNodeCombineRGB",
                             name = "cEmissiveColor",
                             position = (3, 6.5),
-                            default_inputs = {
-                                "R": self.colors["cEmissiveColor"][0],
-                                "G": self.colors["cEmissiveColor"][1],
-                                "B": self.colors["cEmissiveColor"][2],
-                            },
+                            default_inputs = {},
                             inputs = {}
         )
         c_diffuse_mult = self.add_shader_node(node_tree, "ShaderNodeCombineRGB",
                             name = "cDiffuseColor",
                             position = (2, 6.5),
-                            default_inputs = {
-                                "R": self.colors["cDiffuseColor"][0],
-                                "G": self.colors["cDiffuseColor"][1],
-                                "B": self.colors["cDiffuseColor"][2],
-                            },
+                            default_inputs = {},
                             inputs = {}
         )
         
@@ -554,14 +638,51 @@ class Material:
         
         
         material.blend_method = "CLIP"
+        return material
+        
+    def as_blender_material(self):
+
+        cache_key = self.get_material_cache_key()
+        cached_material = Material.materialCache.get(cache_key)
+        if cached_material is not None:
+            return cached_material
+        
+        material = self.get_template_material().copy()
+        material.use_fake_user = False #Only the template keeps itself alive.
+        material.name = self.name
+        
+        material.dynamic_properties.from_node(self.node)
+        nodes = material.node_tree.nodes
+        
+        for texture_name in self.texture_definitions.keys():
+            texture_node = nodes[texture_name]
+            texture_path = Path(self.textures[texture_name])
+            texture = self.get_texture(texture_path)
+            if texture is not None:
+                texture_node.image = texture
+                if "Norm" in texture_name or "Metal" in texture_name or "Height" in texture_name:
+                    texture_node.image.colorspace_settings.name = 'Non-Color'
 
+            texture_node.anno_properties.enabled = self.texture_enabled[texture_name]
+            extension = texture_path.suffix
+            if extension not in [".png", ".psd"]:
+                if texture_path != Path(""):
+                    print("Warning: Unsupported texture file extension", extension, texture_path)
+                extension = ".psd"
+            texture_node.anno_properties.original_file_extension = extension
+        
+        for color_name in self.color_definitions:
+            inputs = nodes[color_name].inputs
+            inputs["R"].default_value = self.colors[color_name][0]
+            inputs["G"].default_value = self.colors[color_name][1]
+            inputs["B"].default_value = self.colors[color_name][2]
         
         #Store all kinds of properties for export
         for prop, value in self.custom_properties.items():
             material[prop] = value
 
 
-        Material.materialCache[self.get_material_cache_key()] = material
+        Material.materialCache[cache_key] = material
         return material
     
     def add_shader_node(self, node_tree, node_type, **kwargs):
@@ -604,4 +725,5 @@ class ClothMaterial(Material):
         "height":"cHeightMap",
         "night_glow":"cNightGlowMap",
         "dye":"cClothDyeMask",
-    }
\ No newline at end of file
+    }
+    template_material_name = ".AnnoClothMaterialTemplate"
\ No newline at end of file
@@ -10,24 +10,101 @@ import xml.etree.ElementTree as ET
 import os
 import re
 import math
+import json
+import hashlib
 import subprocess
 import mathutils
 from datetime import datetime
-from pathlib import Path, PurePath
+from collections import defaultdict
+from pathlib import Path
 from typing import Tuple, List, NewType, Any, Union, Dict, Optional, TypeVar, Type
 
 from . import feedback_enums
 from .simple_anno_feedback_encoding import SimpleAnnoFeedbackEncoding
-from .prefs import IO_AnnocfgPreferences
+from .prefs import IO_AnnocfgPreferences, clear_preference_cache
 from .anno_objects import get_anno_object_class, anno_object_classes, Transform, AnnoObject, MainFile, Model, SimpleAnnoFeedbackEncodingObject, \
     SubFile, Decal, Propcontainer, Prop, Particle, IfoCube, IfoPlane, Sequence, DummyGroup, ArbitraryXMLAnnoObject, Material, \
     Dummy, Cf7DummyGroup, Cf7Dummy, FeedbackConfig, Light, IfoFile, Cf7File, IslandFile, PropGridInstance, IslandGamedataFile, AssetsXML,\
-    Animation, Cloth, BezierCurve, GameObject, AnimationsNode, AnimationSequences, AnimationSequence, Track, TrackElement, IfoMeshHeightmap,BezierCurve,Spline
+    Animation, Cloth, BezierCurve, GameObject, AnimationsNode, AnimationSequences, AnimationSequence, Track, TrackElement, IfoMeshHeightmap,BezierCurve,Spline, prefetch_cfg_files, select_as_active
 
 
-from .utils import data_path_to_absolute_path, to_data_path
+from .utils import data_path_to_absolute_path, to_data_path, write_xml_file, node_from_template, clear_absolute_path_cache
 
 
+#Parsed once, copied by node_from_template for every imported object.
+SUBFILE_TEMPLATE = ET.fromstring("""
+    <Config>
+        <FileName></FileName>
+        <AdaptTerrainHeight>1</AdaptTerrainHeight>
+        <ConfigType>FILE</ConfigType>
+        <Transformer>
+            <Config>
+            <ConfigType>ORIENTATION_TRANSFORM</ConfigType>
+            <Conditions>0</Conditions>
+            </Config>
+        </Transformer>
+    </Config>
+""")
+MODEL_TEMPLATE = ET.fromstring("""
+    <Config>
+        <FileName></FileName>
+        <Name></Name>
+        <ConfigType>MODEL</ConfigType>
+    </Config>
+""")
+CFG_FILE_TEMPLATE = ET.fromstring("""
+    <Config>
+        <ConfigType>FILE</ConfigType>
+        <FileName></FileName>
+        <AdaptTerrainHeight>1</AdaptTerrainHeight>
+    </Config>
+""")
+PROP_TEMPLATE = ET.fromstring("""
+    <Config>
+        <ConfigType>PROP</ConfigType>
+        <FileName></FileName>
+        <Name></Name>
+        <Flags>1</Flags>
+    </Config>
+""")
+
+#Directories that are part of every data path and therefore useless as asset tags.
+ASSET_TAG_SKIP_DIRECTORIES = frozenset(("graphics", "data"))
+
+def asset_tags_from_path(data_path):
+    """Returns the directories of a forward slash separated data path that are usable as asset tags, each one once.
+    The last part is the file name and never a tag.
+    """
+    return list(dict.fromkeys(d for d in data_path.split("/")[:-1] if d and d not in ASSET_TAG_SKIP_DIRECTORIES))
+
+PREVIEW_BATCH_SIZE = 8
+#Stored in the prop cache index. Entries of other versions are rebuilt.
+PROP_CACHE_VERSION = 2
+
+def generate_previews(ids):
+    """Generates the asset previews of all ids after an import loop, so that the loop itself only creates objects.
+    The previews are rendered in small batches from a timer and do not block the operator.
+    """
+    queue = list(ids)
+    debug_output = IO_AnnocfgPreferences.debug_output_enabled()
+    def generate_batch():
+        batch = queue[:PREVIEW_BATCH_SIZE]
+        del queue[:PREVIEW_BATCH_SIZE]
+        for id_data in batch:
+            try:
+                bpy.ops.ed.lib_id_generate_preview({"id": id_data})
+            except ReferenceError: #removed since the import
+                pass
+            except RuntimeError as ex: #The timer runs without a window, the operator can fail its poll.
+                #An exception would unregister the timer and drop the rest of the queue.
+                if debug_output:
+                    print("Failed to generate preview:", ex)
+        if queue:
+            return 0.1
+        return None
+    if queue:
+        bpy.app.timers.register(generate_batch, first_interval = 0.1)
+
 
 class ExportAnnoCfg(Operator, ExportHelper):
     """Exports the selected MAIN_FILE into a .cfg Anno file. Check the export ifo box to also create the .ifo/.cf7 file."""
@@ -85,6 +162,7 @@ class ExportAnnoCfg(Operator, ExportHelper):
     
 
     def execute(self, context):
+        clear_preference_cache()
         if not context.active_object:
             self.report({'ERROR'}, f"MAIN_FILE Object needs to be selected. CANCELLED")
             return {'CANCELLED'}
@@ -92,7 +170,9 @@ class ExportAnnoCfg(Operator, ExportHelper):
         # if not self.main_obj.dynamic_properties.config_type == "MainFile":
         #     self.report({'ERROR'}, f"MAIN_FILE Object needs to be selected. CANCELLED")
         #     return {'CANCELLED'}
-        print("EXPORTING", self.main_obj.name, "to", self.filepath)
+        if IO_AnnocfgPreferences.debug_output_enabled():
+            print("EXPORTING", self.main_obj.name, "to", self.filepath)
+        Material.image_data_path_cache.clear()
 
         self.initialize_child_map()
 
@@ -128,73 +208,74 @@ class ExportAnnoCfg(Operator, ExportHelper):
         return None
     
     def visit_and_delete_material_lod(self, node):
-        if node.find("MaterialLODInfos"):
-            node.remove(node.find("MaterialLODInfos"))
-        for child in list(node):
+        #Index based, so that no copy of the children list is needed while deleting.
+        i = 0
+        while i < len(node):
+            child = node[i]
+            if child.tag == "MaterialLODInfos":
+                del node[i]
+                continue
             self.visit_and_delete_material_lod(child)
+            i += 1
     
     def export_cfg_file(self):
-        print("EXPORT MAIN OBJ", self.main_obj.name)
+        if IO_AnnocfgPreferences.debug_output_enabled():
+            print("EXPORT MAIN OBJ", self.main_obj.name)
         self.root = MainFile.blender_to_xml(self.main_obj, None, self.children_by_object)
         
                 
         if self.delete_material_lod_info:
             self.visit_and_delete_material_lod(self.root)
         
-        tree = ET.ElementTree(self.root)
-        ET.indent(tree, space="\t", level=0)
-        tree.write(self.filepath)
+        write_xml_file(self.root, self.filepath)
         
         self.report({'INFO'}, 'cfg export completed')
 
     def get_text(self, node, query, default = ""):
-        if node.find(query) is not None:
-            return node.find(query).text
+        subnode = node.find(query)
+        if subnode is not None:
+            return subnode.text
         return default
 
     def export_ifo(self, ifo_obj, ifo_filepath):
-        print("EXPORT IFO", ifo_obj.name)
+        if IO_AnnocfgPreferences.debug_output_enabled():
+            print("EXPORT IFO", ifo_obj.name)
         root = IfoFile.blender_to_xml(ifo_obj, None, self.children_by_object)
-        ifotree = ET.ElementTree(element = root)
-        
-        ET.indent(ifotree, space="\t", level=0)
-        ifotree.write(ifo_filepath)
+        write_xml_file(root, ifo_filepath)
 
     def export_cf7_file(self, cf7_object, cf7_filepath): 
         cf7root = Cf7File.blender_to_xml(cf7_object, None, self.children_by_object)
-        cf7tree = ET.ElementTree(cf7root)
-        ET.indent(cf7tree, space="\t", level=0)
-        cf7tree_string = ET.tostring(cf7root, encoding='unicode', method='xml')
-        cf7tree_string = cf7tree_string.replace("</cf7_imaginary_root>", "").replace("<cf7_imaginary_root>","").rstrip("\n")
+        ET.indent(cf7root, space="\t", level=0)
+        #The imaginary root is not written, only its children. The file does not end with a newline.
+        if len(cf7root):
+            cf7root[-1].tail = None
         with open(cf7_filepath, 'w') as f:
-            f.write(cf7tree_string)
+            f.write(cf7root.text or "")
+            for child in cf7root:
+                ET.ElementTree(child).write(f, encoding='unicode', method='xml')
         if IO_AnnocfgPreferences.get_path_to_fc_converter().exists():
-            subprocess.call(f"\"{IO_AnnocfgPreferences.get_path_to_fc_converter()}\" -w \"{cf7_filepath}\" -y -o \"{cf7_filepath.with_suffix('.fc')}\"")
+            subprocess.call([str(IO_AnnocfgPreferences.get_path_to_fc_converter()), "-w", str(cf7_filepath), "-y", "-o", str(cf7_filepath.with_suffix('.fc'))])
         return
 
    
 
     def export_safe_file(self, feedback_object, safe_filepath): 
         root = SimpleAnnoFeedbackEncodingObject.blender_to_xml(feedback_object, None, self.children_by_object)
-        tree = ET.ElementTree(root)
-
-        ET.indent(tree, space="\t", level=0)
-        tree.write(safe_filepath)
+        write_xml_file(root, safe_filepath)
         if self.convert_safe_to_fc:
             safe = SimpleAnnoFeedbackEncoding(root)
             safe.write_as_cf7(safe_filepath.with_suffix(".cf7"), self.feedback_loop_mode)
             if IO_AnnocfgPreferences.get_path_to_fc_converter().exists():
-                subprocess.call(f"\"{IO_AnnocfgPreferences.get_path_to_fc_converter()}\" -w \"{safe_filepath.with_suffix('.cf7')}\" -y -o \"{safe_filepath.with_suffix('.fc')}\"")
+                subprocess.call([str(IO_AnnocfgPreferences.get_path_to_fc_converter()), "-w", str(safe_filepath.with_suffix('.cf7')), "-y", "-o", str(safe_filepath.with_suffix('.fc'))])
 
 
     def initialize_child_map(self):
-        self.children_by_object = {}
+        #defaultdict, so that objects without children map to an empty list.
+        self.children_by_object = defaultdict(list)
         for obj in bpy.data.objects:
-            if obj.parent is not None:
-                if obj.parent.name in self.children_by_object:
-                    self.children_by_object[obj.parent.name].append(obj)
-                else:
-                    self.children_by_object[obj.parent.name] = [obj]
+            parent = obj.parent
+            if parent is not None:
+                self.children_by_object[parent.name].append(obj)
 
 
 
@@ -241,11 +322,15 @@ class ImportAnnoCfg(Operator, ImportHelper):
     )
 
     def execute(self, context):
+        clear_absolute_path_cache()
+        clear_preference_cache()
+        Material.texture_cache.clear()
         parent = context.active_object
         dirname = os.path.dirname(self.filepath)
         for f in self.files:
             self.filepath = os.path.join(dirname, f.name)
-            print("IMPORTING FILE", self.filepath)
+            if IO_AnnocfgPreferences.debug_output_enabled():
+                print("IMPORTING FILE", self.filepath)
             
             self.path = Path(self.filepath)
             if self.import_as_subfile:
@@ -268,6 +353,8 @@ class ImportAnnoCfg(Operator, ImportHelper):
                     self.import_cf7_file(self.path.with_suffix(".cf7"), file_obj)
 
             self.report({'INFO'}, "Import of {self.filepath} completed!")
+        #Evaluate the scene once for all imported files instead of relying on per-object updates.
+        context.view_layer.update()
         self.report({'INFO'}, "Imported all Files.")
         return {'FINISHED'}
     
@@ -277,19 +364,7 @@ class ImportAnnoCfg(Operator, ImportHelper):
             self.report({'ERROR_INVALID_CONTEXT'}, f"MAIN_FILE_ Object needs to be selected.")
             return {'CANCELLED'}
         file_name = to_data_path(self.path).as_posix()
-        node = ET.fromstring(f"""
-            <Config>
-                <FileName>{file_name}</FileName>
-                <AdaptTerrainHeight>1</AdaptTerrainHeight>
-                <ConfigType>FILE</ConfigType>
-                <Transformer>
-                    <Config>
-                    <ConfigType>ORIENTATION_TRANSFORM</ConfigType>
-                    <Conditions>0</Conditions>
-                    </Config>
-                </Transformer>
-            </Config>
-        """)
+        node = node_from_template(SUBFILE_TEMPLATE, FileName = file_name)
         blender_obj = SubFile.xml_to_blender(node, parent)
         return {'FINISHED'}
     
@@ -319,15 +394,12 @@ class ImportAnnoCfg(Operator, ImportHelper):
             self.report({'INFO'}, f"Missing file: {fullpath.with_suffix('.fc')}")
             return
         if not fullpath.exists() and fullpath.with_suffix(".fc").exists() and IO_AnnocfgPreferences.get_path_to_fc_converter().exists():
-            subprocess.call(f"\"{IO_AnnocfgPreferences.get_path_to_fc_converter()}\" -r \"{fullpath.with_suffix('.fc')}\" -o \"{fullpath}\"")
+            subprocess.call([str(IO_AnnocfgPreferences.get_path_to_fc_converter()), "-r", str(fullpath.with_suffix('.fc')), "-o", str(fullpath)])
         if not fullpath.exists():
             self.report({'INFO'}, f"Missing file: {fullpath}")
             return
-        root = None
-        with open(fullpath) as f:
-            xml = '<cf7_imaginary_root>' + f.read() + '</cf7_imaginary_root>'
-            root = ET.fromstring(xml)
-        tree = ET.ElementTree(root)
+        xml = b'<cf7_imaginary_root>' + fullpath.read_bytes() + b'</cf7_imaginary_root>'
+        root = ET.fromstring(xml)
         cf7_object = Cf7File.xml_to_blender(root, file_obj)
         cf7_object.name = "CF7FILE"
 
@@ -352,6 +424,7 @@ class ImportAnnoCfg(Operator, ImportHelper):
         root = tree.getroot()
         if root is None:
             return
+        prefetch_cfg_files(root)
         
         file_obj = MainFile.xml_to_blender(root)
         file_obj.name = name
@@ -384,6 +457,9 @@ class ImportAnnoIsland(Operator, ImportHelper):
     )
 
     def execute(self, context):
+        clear_absolute_path_cache()
+        clear_preference_cache()
+        Material.texture_cache.clear()
         self.path = Path(self.filepath)
         
         # Extracting cfg for guid
@@ -438,6 +514,7 @@ class ImportAnnoIslandGamedata(Operator, ImportHelper):
     )
 
     def execute(self, context):
+        clear_preference_cache()
         self.path = Path(self.filepath)
         
         if not self.path.suffix == ".xml" or not self.path.exists():
@@ -469,6 +546,7 @@ class ExportAnnoIsland(Operator, ExportHelper):
     )
 
     def execute(self, context):
+        clear_preference_cache()
         self.path = Path(self.filepath)
         self.obj = context.active_object
         if not self.obj or not get_anno_object_class(self.obj) in [IslandFile]:
@@ -478,9 +556,7 @@ class ExportAnnoIsland(Operator, ExportHelper):
         root = get_anno_object_class(self.obj).blender_to_xml(self.obj)
         if root is None:
             return{'CANCELLED'}
-        tree = ET.ElementTree(root)
-        ET.indent(tree, space="\t", level=0)
-        tree.write(self.filepath)
+        write_xml_file(root, self.filepath)
         self.report({'INFO'}, 'Island export completed.')
         
         return {'FINISHED'}
@@ -507,6 +583,7 @@ class ExportAnnoIslandGamedata(Operator, ExportHelper):
     )
 
     def execute(self, context):
+        clear_preference_cache()
         self.path = Path(self.filepath)
         self.obj = context.active_object
         if not self.obj or not get_anno_object_class(self.obj) in [IslandGamedataFile]:
@@ -516,9 +593,7 @@ class ExportAnnoIslandGamedata(Operator, ExportHelper):
         root = get_anno_object_class(self.obj).blender_to_xml(self.obj)
         if root is None:
             return{'CANCELLED'}
-        tree = ET.ElementTree(root)
-        ET.indent(tree, space="\t", level=0)
-        tree.write(self.filepath)
+        write_xml_file(root, self.filepath)
         self.report({'INFO'}, 'Island export completed.')
         
         return {'FINISHED'}
@@ -542,6 +617,7 @@ class ImportAnnoModelOperator(Operator, ImportHelper):
     )
 
     def execute(self, context):
+        clear_preference_cache()
         self.obj = context.active_object
         if not self.obj or not get_anno_object_class(self.obj) == MainFile:
             self.report({'ERROR_INVALID_CONTEXT'}, f"MAIN_FILE_ Object needs to be selected.")
@@ -568,13 +644,7 @@ class ImportAnnoModelOperator(Operator, ImportHelper):
         
     def import_glb(self):
         data_path = to_data_path(self.path)
-        node = ET.fromstring(f"""
-            <Config>
-                <FileName>{data_path.with_suffix(".rdm").as_posix()}</FileName>
-                <Name>MODEL_{self.path.stem}</Name>
-                <ConfigType>MODEL</ConfigType>
-            </Config>                  
-        """)
+        node = node_from_template(MODEL_TEMPLATE, FileName = data_path.with_suffix(".rdm").as_posix(), Name = f"MODEL_{self.path.stem}")
         blender_obj = Model.xml_to_blender(node, self.obj)
         return blender_obj
     @classmethod
@@ -597,6 +667,7 @@ class ImportAnnoPropOperator(Operator, ImportHelper):
     )
 
     def execute(self, context):
+        clear_preference_cache()
         self.obj = context.active_object
         if not self.obj or not get_anno_object_class(self.obj) == Propcontainer:
             self.report({'ERROR_INVALID_CONTEXT'}, f"PropContainer Object needs to be selected.")
@@ -604,14 +675,7 @@ class ImportAnnoPropOperator(Operator, ImportHelper):
         
         self.path = Path(self.filepath)
         data_path = to_data_path(self.path).as_posix()
-        node = ET.fromstring(f"""
-            <Config>
-                <ConfigType>PROP</ConfigType>
-                <FileName>{data_path}</FileName>
-                <Name>PROP_{self.path.stem}</Name>
-                <Flags>1</Flags>
-            </Config>                  
-        """)
+        node = node_from_template(PROP_TEMPLATE, FileName = data_path, Name = f"PROP_{self.path.stem}")
         blender_obj = Prop.xml_to_blender(node, self.obj)
         
         self.report({'INFO'}, f'Imported {self.obj.name} from {self.filepath}')
@@ -647,12 +711,14 @@ class ExportAnnoModelOperator(Operator, ExportHelper):
     )
 
     def execute(self, context):
+        clear_preference_cache()
         self.obj = context.active_object
         if not self.obj or not get_anno_object_class(self.obj) in [Model, Cloth]:
             self.report({'ERROR_INVALID_CONTEXT'}, f"MODEL_ Object needs to be selected.")
             return {'CANCELLED'}
  
         self.path = Path(self.filepath)
+        self.rdm4_process = None
         
         export_helpers = {
             ".rdm": lambda: self.export_wrapper(lambda: self.export_rdm()),
@@ -663,18 +729,30 @@ class ExportAnnoModelOperator(Operator, ExportHelper):
             self.report({'ERROR_INVALID_INPUT'}, f"Invalid extension.")
             return {'CANCELLED'}
         
-        export_helpers[self.path.suffix]()
+        rdm4_returncode = 0
         try:
-            data_path = to_data_path(self.path)
-            self.obj.dynamic_properties.set("FileName", data_path.as_posix(), replace = True)
-            
-        except ValueError:
-            self.report({'INFO'}, f'Warning, export not relative to rda folder, could not adapt FileName')
-            pass
+            export_helpers[self.path.suffix]()
+            try:
+                data_path = to_data_path(self.path)
+                self.obj.dynamic_properties.set("FileName", data_path.as_posix(), replace = True)
+                
+            except ValueError:
+                self.report({'INFO'}, f'Warning, export not relative to rda folder, could not adapt FileName')
+                pass
+        finally:
+            #The conversion started by export_rdm is always awaited, even if the export failed after starting it.
+            if self.rdm4_process is not None:
+                rdm4_returncode = self.rdm4_process.wait()
+        if rdm4_returncode != 0:
+            self.report({'ERROR'}, f'rdm4 failed with exit code {rdm4_returncode}, {self.path} was not written')
+            return {'CANCELLED'}
         self.report({'INFO'}, f'Exported {self.obj.name} to {self.filepath}')
         return {'FINISHED'}
     
     def export_rdm(self):
+        """Exports the .glb and starts the rdm4 conversion without waiting for it.
+        The process is awaited at the end of execute, so restoring the mesh runs in parallel to the conversion.
+        """
         self.export_glb(self.path.with_suffix(".glb"))
         
         rdm4_path = IO_AnnocfgPreferences.get_path_to_rdm4()
@@ -683,7 +761,7 @@ class ExportAnnoModelOperator(Operator, ExportHelper):
             if self.path.exists():
                 self.path.unlink()
             print(f"Subprocess: \"{rdm4_path}\" --gltf={self.vertex_format} --input \"{self.path.with_suffix('.glb')}\" -n --outdst \"{self.path.parent}\"")
-            subprocess.call(f"\"{rdm4_path}\" --gltf={self.vertex_format} --input \"{self.path.with_suffix('.glb')}\" -n --outdst \"{self.path.parent}\"", shell = True)
+            self.rdm4_process = subprocess.Popen([str(rdm4_path), f"--gltf={self.vertex_format}", "--input", str(self.path.with_suffix('.glb')), "-n", "--outdst", str(self.path.parent)])
     
     def export_glb(self, filepath = None):
         if filepath is None:
@@ -700,11 +778,11 @@ class ExportAnnoModelOperator(Operator, ExportHelper):
         self.obj.parent = None
         
         matrix = self.obj.matrix_world.copy()
-        for vert in self.obj.data.vertices:
-            vert.co = matrix @ vert.co
+        #Mesh.transform applies the matrix to all vertices in C instead of one Vector at a time.
+        self.obj.data.transform(matrix)
         self.obj.matrix_world.identity()
         
-        Transform().mirror_mesh(self.obj)
+        Transform.mirror_mesh(self.obj)
         
         self.obj = bpy.context.active_object
         for other_object in bpy.context.selected_objects:
@@ -713,12 +791,11 @@ class ExportAnnoModelOperator(Operator, ExportHelper):
         
         export_function()
         
-        Transform().mirror_mesh(self.obj)
+        Transform.mirror_mesh(self.obj)
     
         inverse = matrix.copy()
         inverse.invert()
-        for vert in self.obj.data.vertices:
-            vert.co = inverse @ vert.co
+        self.obj.data.transform(inverse)
         self.obj.matrix_world = matrix
         
         self.obj.parent = parent
@@ -846,6 +923,7 @@ class OBJECT_OT_add_anno_object(Operator, AddObjectHelper):
         # obj.name = obj.name.split("_")[1] + self.object_type
         if self.parent:
             obj.parent = self.parent
+        select_as_active(obj)
 
         return {'FINISHED'}
 
@@ -861,9 +939,116 @@ class ImportAllPropsOperator(Operator, ImportHelper):
     filename_ext = "."
     use_filter_folder = True
     
+    mark_as_assets: BoolProperty( #type: ignore
+        name="Mark as Assets",
+        description="Marks the props as assets with tags and previews. Disable to only import them (for example to fill the prop cache).",
+        default=True,
+    )
+    
+    def find_prop_files(self, dirpath):
+        """Yields all .prp files below dirpath, except decal_details. Only creates Path objects for matching files."""
+        for root, _, filenames in os.walk(dirpath):
+            for filename in filenames:
+                if not filename.endswith(".prp") or "decal_detail" in filename:
+                    continue
+                yield Path(root, filename)
+    
+    def read_prop_cache_index(self):
+        """The index maps each cache key to the data path of the cached prop and the latest modification time of its files."""
+        self.prop_cache_index = {}
+        self.prop_cache_path = None
+        if IO_AnnocfgPreferences.preferences().prop_cache_path == "":
+            return
+        self.prop_cache_path = IO_AnnocfgPreferences.get_prop_cache_path()
+        if not self.prop_cache_path.is_dir():
+            print(f"Warning, invalid prop cache path {self.prop_cache_path}")
+            self.prop_cache_path = None
+            return
+        index_path = Path(self.prop_cache_path, "index.json")
+        if index_path.exists():
+            try:
+                self.prop_cache_index = json.loads(index_path.read_text())
+            except (OSError, ValueError) as ex:
+                #All props are imported again and the index is rewritten.
+                print(f"Warning, ignoring unreadable prop cache index {index_path}: {ex}")
+    
+    def write_prop_cache_index(self):
+        if self.prop_cache_path is None:
+            return
+        #Written next to the index and moved in place, so that an aborted write cannot leave a truncated index.
+        index_path = Path(self.prop_cache_path, "index.json")
+        tmp_path = index_path.with_name("index.json.tmp")
+        tmp_path.write_text(json.dumps(self.prop_cache_index, indent = 1))
+        os.replace(tmp_path, index_path)
+    
+    def is_prop_cached(self, cache_key, last_modified):
+        if self.prop_cache_path is None:
+            return False
+        entry = self.prop_cache_index.get(cache_key)
+        if entry is None or entry.get("version") != PROP_CACHE_VERSION or entry["last_modified"] < last_modified:
+            return False
+        return Path(self.prop_cache_path, cache_key + ".blend").exists()
+    
+    def prop_last_modified(self, prop_file, data_path):
+        """Latest modification time of the .prp file and of the model and texture files it references,
+        so that a cached prop is rebuilt when any of them changes."""
+        model_filename, material = Prop.get_prop_data(data_path)
+        fullpaths = [prop_file]
+        if model_filename:
+            model_fullpath = data_path_to_absolute_path(model_filename)
+            fullpaths += [model_fullpath, model_fullpath.with_suffix(".glb")]
+        if material is not None:
+            fullpaths += material.texture_fullpaths()
+        last_modified = 0.0
+        for fullpath in fullpaths:
+            try:
+                last_modified = max(last_modified, fullpath.stat().st_mtime)
+            except OSError: #Missing, for example a texture that was never converted.
+                pass
+        return last_modified
+    
+    def load_cached_prop(self, cache_key, last_modified, data_path):
+        if not self.is_prop_cached(cache_key, last_modified):
+            return None
+        cache_file = Path(self.prop_cache_path, cache_key + ".blend")
+        with bpy.data.libraries.load(str(cache_file)) as (data_from, data_to):
+            data_to.objects = data_from.objects
+        if not data_to.objects:
+            return None
+        obj = data_to.objects[0]
+        bpy.context.scene.collection.objects.link(obj)
+        #The cache only holds the mesh. The material is shared with the other props through Material.materialCache.
+        _, material = Prop.get_prop_data(data_path)
+        if material is not None:
+            blender_material = material.as_blender_material()
+            if len(obj.data.materials) == 0:
+                obj.data.materials.append(blender_material)
+            else:
+                obj.data.materials[0] = blender_material
+        return obj
+    
+    def cache_prop(self, blender_obj, cache_key, data_path, last_modified):
+        if self.prop_cache_path is None:
+            return
+        cache_file = Path(self.prop_cache_path, cache_key + ".blend")
+        #Written without materials, otherwise every cached prop would bring its own copies of the materials and images.
+        cache_obj = blender_obj.copy()
+        cache_obj.data = blender_obj.data.copy()
+        for slot in range(len(cache_obj.data.materials)):
+            cache_obj.data.materials[slot] = None
+        try:
+            bpy.data.libraries.write(str(cache_file), {cache_obj}, fake_user=True)
+        finally:
+            cache_mesh = cache_obj.data
+            bpy.data.objects.remove(cache_obj)
+            bpy.data.meshes.remove(cache_mesh)
+        self.prop_cache_index[cache_key] = {"data_path": data_path, "last_modified": last_modified, "version": PROP_CACHE_VERSION}
     
     def execute(self, context):
         self.report({'INFO'}, f"Importing all props from {self.filepath}...")
+        clear_absolute_path_cache()
+        clear_preference_cache()
+        Material.texture_cache.clear()
         dirpath = Path(self.filepath)
         rda_path = IO_AnnocfgPreferences.get_path_to_rda_folder()
         if not dirpath.is_relative_to(rda_path):
@@ -873,37 +1058,71 @@ class ImportAllPropsOperator(Operator, ImportHelper):
             self.report({'ERROR_INVALID_INPUT'}, f"Invalid folder. Needs to be inside your rda folder.")
             return {"CANCELLED"}
         
+        self.read_prop_cache_index()
+        use_prop_cache = self.prop_cache_path is not None
         i = 0
         y_loc = 0
-        for p in dirpath.rglob('*.prp'):
-            if "decal_detail" in p.name:
-                continue
-            print(p)
-            i+=1
-            data_path = to_data_path(p).as_posix()
-            node = ET.fromstring(f"""
-                <Config>
-                    <ConfigType>PROP</ConfigType>
-                    <FileName>{data_path}</FileName>
-                    <Name>PROP_{p.stem}</Name>
-                    <Flags>1</Flags>
-                </Config>                  
-            """)
-            try:
-                blender_obj = Prop.xml_to_blender(node)
-                if blender_obj.type == "EMPTY":
-                    bpy.ops.object.delete()
+        debug_output = IO_AnnocfgPreferences.debug_output_enabled()
+        tags_by_directory: Dict[str, Tuple[str, ...]] = {} #props of one folder share their tags
+        preview_ids = []
+        mark_as_assets = self.mark_as_assets
+        #Every created object would otherwise push its own undo step.
+        use_global_undo = context.preferences.edit.use_global_undo
+        context.preferences.edit.use_global_undo = False
+        try:
+            prop_files = []
+            for p in self.find_prop_files(dirpath):
+                #dirpath is inside the rda folder, so we can skip the lookup in to_data_path.
+                data_path = p.relative_to(rda_path).as_posix()
+                prop_files.append((p, data_path))
+            #Parsing the .prp files does not need bpy, only the object creation has to happen in this thread.
+            #Cached props need their data as well, for the cache validation and their material.
+            Prop.preload_prop_data([data_path for _, data_path in prop_files])
+            for p, data_path in prop_files:
+                if debug_output:
+                    print(p)
+                i+=1
+                blender_obj = None
+                #The cache key and the modification times are only needed with a prop cache.
+                if use_prop_cache:
+                    cache_key = hashlib.blake2b(data_path.encode(), digest_size=8).hexdigest()
+                    blender_obj = self.load_cached_prop(cache_key, self.prop_last_modified(p, data_path), data_path)
+                if blender_obj is None:
+                    try:
+                        if not Prop.has_model(data_path):
+                            continue
+                        node = node_from_template(PROP_TEMPLATE, FileName = data_path, Name = f"PROP_{p.stem}")
+                        blender_obj = Prop.xml_to_blender(node)
+                    except Exception as ex:
+                        self.report({'WARNING'}, f"Failed to import {data_path}: {ex}")
+                        continue
+                    if blender_obj.type == "EMPTY":
+                        bpy.data.objects.remove(blender_obj, do_unlink=True)
+                        continue
+                    if use_prop_cache:
+                        #The import may have converted the model and textures, which changes their modification times.
+                        self.cache_prop(blender_obj, cache_key, data_path, self.prop_last_modified(p, data_path))
+                blender_obj.location.y = y_loc
+                y_loc += 1
+                blender_obj.name = p.name
+                if not mark_as_assets:
                     continue
-            except:
-                continue
-            blender_obj.location.y = y_loc
-            y_loc += 1
-            blender_obj.name = p.name
-            blender_obj.asset_mark()
-            for directory in PurePath(data_path).parts[:-1]:
-                if directory not in ["graphics", "data"]:
-                    blender_obj.asset_data.tags.new(directory)
-            bpy.ops.ed.lib_id_generate_preview({"id": blender_obj})
+                blender_obj.asset_mark()
+                parent_directory = data_path.rpartition("/")[0]
+                tags = tags_by_directory.get(parent_directory)
+                if tags is None:
+                    tags = tuple(asset_tags_from_path(data_path))
+                    tags_by_directory[parent_directory] = tags
+                asset_tags = blender_obj.asset_data.tags
+                for tag in tags:
+                    asset_tags.new(tag)
+                preview_ids.append(blender_obj)
+        finally:
+            context.preferences.edit.use_global_undo = use_global_undo
+            #Keeps the entries of the props that were cached before an error.
+            self.write_prop_cache_index()
+        context.view_layer.update()
+        generate_previews(preview_ids)
         return {"FINISHED"}
 
 
@@ -923,6 +1142,9 @@ class ImportAllCfgsOperator(Operator, ImportHelper):
     
     def execute(self, context):
         self.report({'INFO'}, f"Importing all cfgs from {self.filepath}...")
+        clear_absolute_path_cache()
+        clear_preference_cache()
+        Material.texture_cache.clear()
         dirpath = Path(self.filepath)
         rda_path = IO_AnnocfgPreferences.get_path_to_rda_folder()
         if not dirpath.is_relative_to(rda_path):
@@ -934,20 +1156,18 @@ class ImportAllCfgsOperator(Operator, ImportHelper):
             return {"CANCELLED"}
         
         i = 0
+        debug_output = IO_AnnocfgPreferences.debug_output_enabled()
+        preview_ids = []
         for p in dirpath.rglob('*.cfg'):
-            print(i, p)
+            if debug_output:
+                print(i, p)
             i+=1
             data_path = to_data_path(p).as_posix()
-            node = ET.fromstring(f"""
-                <Config>
-                    <ConfigType>FILE</ConfigType>
-                    <FileName>{data_path}</FileName>
-                    <AdaptTerrainHeight>1</AdaptTerrainHeight>
-                </Config>                  
-            """)
+            node = node_from_template(CFG_FILE_TEMPLATE, FileName = data_path)
             try:
                 blender_obj = SubFile.xml_to_blender(node)
-            except:
+            except Exception as ex:
+                self.report({'WARNING'}, f"Failed to import {data_path}: {ex}")
                 continue
              
             collection = bpy.context.blend_data.collections.new(name=p.name)
@@ -955,12 +1175,14 @@ class ImportAllCfgsOperator(Operator, ImportHelper):
             self.add_to_collection_recursively(blender_obj, collection)
             
             collection.asset_mark()
-            collection.asset_data.tags.new("cfg")
-            collection.asset_data.description = data_path
-            for directory in PurePath(data_path).parts[:-1]:
-                if directory not in ["graphics", "data"]:
-                    collection.asset_data.tags.new(directory)
-            bpy.ops.ed.lib_id_generate_preview({"id": collection})
+            asset_data = collection.asset_data
+            asset_data.description = data_path
+            asset_tags = asset_data.tags
+            asset_tags.new("cfg")
+            for directory in asset_tags_from_path(data_path):
+                asset_tags.new(directory)
+            preview_ids.append(collection)
+        generate_previews(preview_ids)
         return {"FINISHED"}
 
 
@@ -982,85 +1204,66 @@ classes = (
     # ExportAnimatedAnnoModelOperator,
 )
 
-def add_anno_object_button(self, context):
-    self.layout.operator(
-        OBJECT_OT_add_anno_object.bl_idname,
-        text="Add Anno Feedback Object",
-        icon='PLUGIN')
-
-
-def menu_func_import(self, context):
-    self.layout.operator(ImportAnnoCfg.bl_idname, text="Anno (.cfg)")
-
-
-def menu_func_export_cfg(self, context):
-    self.layout.operator(ExportAnnoCfg.bl_idname, text="Anno (.cfg)")
-    
-def menu_func_export_model(self, context):
-    self.layout.operator(ExportAnnoModelOperator.bl_idname, text="Anno Model (.rdm/.glb)")
-    
-# def menu_func_export_animation(self, context):
-#     self.layout.operator(ExportAnimatedAnnoModelOperator.bl_idname, text="Anno Animation (.rdm)")
-        
-def menu_func_import_model(self, context):
-    self.layout.operator(ImportAnnoModelOperator.bl_idname, text="Anno Model (.rdm/.glb)")
-def menu_func_import_prop(self, context):
-    self.layout.operator(ImportAnnoPropOperator.bl_idname, text="Anno Prop (.prp)")
-
-def menu_func_import_all_props(self, context):
-    self.layout.operator(ImportAllPropsOperator.bl_idname, text="Import Anno Prop Assets")
-
-def menu_func_import_all_cfgs(self, context):
-    self.layout.operator(ImportAllCfgsOperator.bl_idname, text="Import Anno Cfgs Assets")
-
-def menu_func_import_island(self, context):
-    self.layout.operator(ImportAnnoIsland.bl_idname, text="Anno Island (.xml)")
-def menu_func_import_island_gamedata(self, context):
-    self.layout.operator(ImportAnnoIslandGamedata.bl_idname, text="Anno Island Gamedata (.xml)")
-
-def menu_func_export_island(self, context):
-    self.layout.operator(ExportAnnoIsland.bl_idname, text="Anno Island (.xml)")
-
-def menu_func_export_island_gamedata(self, context):
-    self.layout.operator(ExportAnnoIslandGamedata.bl_idname, text="Anno Island Gamedata (.xml)")
-
-import_funcs = [
-    menu_func_import,
-    menu_func_import_model,
-    menu_func_import_prop,
-    menu_func_import_island,
-    menu_func_import_island_gamedata,
-]
-export_funcs = [
-    menu_func_export_cfg,
-    menu_func_export_model,
-    menu_func_export_island,
-    menu_func_export_island_gamedata,
-    # menu_func_export_animation,
+def operator_menu_func(operator, text, icon = 'NONE'):
+    """Creates a menu draw function for the given operator.
+    The bl_idname is looked up once here instead of on every redraw of the menu.
+    """
+    bl_idname = operator.bl_idname
+    def menu_func(self, context):
+        self.layout.operator(bl_idname, text=text, icon=icon)
+    return menu_func
+
+add_anno_object_button = operator_menu_func(OBJECT_OT_add_anno_object, "Add Anno Feedback Object", icon='PLUGIN')
+
+menu_func_import = operator_menu_func(ImportAnnoCfg, "Anno (.cfg)")
+menu_func_export_cfg = operator_menu_func(ExportAnnoCfg, "Anno (.cfg)")
+menu_func_export_model = operator_menu_func(ExportAnnoModelOperator, "Anno Model (.rdm/.glb)")
+# menu_func_export_animation = operator_menu_func(ExportAnimatedAnnoModelOperator, "Anno Animation (.rdm)")
+menu_func_import_model = operator_menu_func(ImportAnnoModelOperator, "Anno Model (.rdm/.glb)")
+menu_func_import_prop = operator_menu_func(ImportAnnoPropOperator, "Anno Prop (.prp)")
+menu_func_import_all_props = operator_menu_func(ImportAllPropsOperator, "Import Anno Prop Assets")
+menu_func_import_all_cfgs = operator_menu_func(ImportAllCfgsOperator, "Import Anno Cfgs Assets")
+menu_func_import_island = operator_menu_func(ImportAnnoIsland, "Anno Island (.xml)")
+menu_func_import_island_gamedata = operator_menu_func(ImportAnnoIslandGamedata, "Anno Island Gamedata (.xml)")
+menu_func_export_island = operator_menu_func(ExportAnnoIsland, "Anno Island (.xml)")
+menu_func_export_island_gamedata = operator_menu_func(ExportAnnoIslandGamedata, "Anno Island Gamedata (.xml)")
+
+menu_bindings = [
+    (bpy.types.TOPBAR_MT_file_import, [
+        menu_func_import,
+        menu_func_import_model,
+        menu_func_import_prop,
+        menu_func_import_island,
+        menu_func_import_island_gamedata,
+    ]),
+    (bpy.types.TOPBAR_MT_file, [
+        menu_func_import_all_props,
+        menu_func_import_all_cfgs,
+    ]),
+    (bpy.types.TOPBAR_MT_file_export, [
+        menu_func_export_cfg,
+        menu_func_export_model,
+        menu_func_export_island,
+        menu_func_export_island_gamedata,
+        # menu_func_export_animation,
+    ]),
+    (bpy.types.VIEW3D_MT_mesh_add, [
+        add_anno_object_button,
+    ]),
 ]
 
 def register():
     from bpy.utils import register_class
     for cls in classes:
         register_class(cls)
-    for func in import_funcs:
-        bpy.types.TOPBAR_MT_file_import.append(func)
-    bpy.types.TOPBAR_MT_file.append(menu_func_import_all_props)
-    bpy.types.TOPBAR_MT_file.append(menu_func_import_all_cfgs)
-    for func in export_funcs:
-        bpy.types.TOPBAR_MT_file_export.append(func)
-
-    bpy.types.VIEW3D_MT_mesh_add.append(add_anno_object_button)
+    for menu, funcs in menu_bindings:
+        for func in funcs:
+            menu.append(func)
 
 def unregister():
     from bpy.utils import unregister_class
     for cls in classes:
         unregister_class(cls)
-    for func in import_funcs:
-        bpy.types.TOPBAR_MT_file_import.remove(func)
-    bpy.types.TOPBAR_MT_file.remove(menu_func_import_all_props)
-    bpy.types.TOPBAR_MT_file.remove(menu_func_import_all_cfgs)
-    for func in export_funcs:
-        bpy.types.TOPBAR_MT_file_export.remove(func)
-        
-    bpy.types.VIEW3D_MT_mesh_add.remove(add_anno_object_button)
\ No newline at end of file
+    for menu, funcs in menu_bindings:
+        for func in funcs:
+            menu.remove(func)
\ No newline at end of file
@@ -20,6 +20,34 @@ from bpy.types import AddonPreferences, Scene
 from bpy.props import StringProperty, EnumProperty, BoolProperty, FloatProperty
 
 from pathlib import Path
+from functools import lru_cache
+import random
+
+@lru_cache(maxsize=16)
+def cached_path(path_string: str) -> Path:
+    """Path objects are immutable, so the path getters can share one instance per preference value.
+    Enough entries for all path preferences, older values from edits are evicted.
+    """
+    return Path(path_string)
+
+TEXTURE_QUALITY_ITEMS = [
+    ("0", "High", "High (_0.dds)"),
+    ("1", "Medium", "Medium (_1.dds)"),
+    ("2", "Low", "Low (_2.dss)"),
+]
+#Values of preferences that are read per file, texture or object, by property name.
+#Filled on first read and cleared by the update callbacks of these properties. The callbacks do not run when the
+#preferences are reverted, reset or the addon is re-enabled, so register and every import and export clear it as well.
+preference_cache = {}
+
+def clear_preference_cache():
+    preference_cache.clear()
+
+def reset_preference_cache(self, context):
+    clear_preference_cache()
+
+#Suffix of the texture files of each quality, built once instead of per texture.
+TEXTURE_QUALITY_SUFFIXES = {quality: "_" + quality for quality, _, _ in TEXTURE_QUALITY_ITEMS}
 
 class IO_AnnocfgPreferences(AddonPreferences):
     bl_idname = __package__
@@ -29,6 +57,7 @@ class IO_AnnocfgPreferences(AddonPreferences):
         description = "Path where you unpacked the Anno rda files. Should contain the data folder.",
         subtype='FILE_PATH',
         default = "",
+        update = reset_preference_cache,
     )
     path_to_rdm4 : StringProperty( # type: ignore
         name = "Path to rdm4-bin.exe",
@@ -51,12 +80,9 @@ class IO_AnnocfgPreferences(AddonPreferences):
     texture_quality : EnumProperty( #type: ignore
         name='Texture Quality',
         description='Determines which texture files will be used (_0.dds, _1.dds, etc). 0 is the highest setting. Only applies to newly imported models.',
-        items= [
-            ("0", "High", "High (_0.dds)"),
-            ("1", "Medium", "Medium (_1.dds)"),
-            ("2", "Low", "Low (_2.dss)"),
-        ],
-        default='0')
+        items= TEXTURE_QUALITY_ITEMS,
+        default='0',
+        update = reset_preference_cache)
     enable_splines : BoolProperty( # type: ignore
         name = "Import/Export Spline Data (Experimental)",
         description = "If .fc splines are imported/exported.",
@@ -65,12 +91,14 @@ class IO_AnnocfgPreferences(AddonPreferences):
     mirror_models_bool : BoolProperty( # type: ignore
         name = "Mirror along X",
         description = "The anno engine mirrors object along the X axis. When enabled, the addon will also mirror meshes along the X axis s.t. text is displayed correctly. However, this means that all .glb files imported directly (using the .glb import instead of the .rmd import) will have the wrong orientation, to avoid this uncheck this box. Keep in mind that when you change this setting, all your exising .blend files will not export properly.",
-        default = True
+        default = True,
+        update = reset_preference_cache,
     )
     sequences_as_blender_objects : BoolProperty( # type: ignore
         name = "Sequences as Blender Objects",
         description = "Turns sequences into blender objects and resolves ModelID (and ParticleID) references to their respective blender object. Allows easier handling of animated files and prevents errors coming from a reordering of the models when exporting. ",
-        default = True
+        default = True,
+        update = reset_preference_cache,
     )
     cfg_cache_probability_float : FloatProperty( # type: ignore
         name = "Cfg Cache Probability",
@@ -90,6 +118,18 @@ class IO_AnnocfgPreferences(AddonPreferences):
         subtype='FILE_PATH',
         default = "C:\\Users\\Public\\Anno\\CfgCache",
     )
+    prop_cache_path : StringProperty( # type: ignore
+        name = "Path to prop cache",
+        description = "Folder in which Import All Props stores each imported prop as .blend file, so that unchanged props do not have to be imported again. Leave empty to disable.",
+        subtype='FILE_PATH',
+        default = "",
+    )
+    debug_output_bool : BoolProperty( # type: ignore
+        name = "Verbose Console Output",
+        description = "Prints every imported file and model to the console. Slows down large imports (f.e. Import All Props).",
+        default = False,
+        update = reset_preference_cache,
+    )
     
     def draw(self, context):
         layout = self.layout
@@ -104,40 +144,69 @@ class IO_AnnocfgPreferences(AddonPreferences):
         layout.prop(self, "cfg_cache_loading_enabled_bool")
         layout.prop(self, "cfg_cache_probability_float")
         layout.prop(self, "cfg_cache_path")
+        layout.prop(self, "prop_cache_path")
+        layout.prop(self, "debug_output_bool")
 
     @classmethod
+    def preferences(cls) -> "IO_AnnocfgPreferences":
+        return bpy.context.preferences.addons[__package__].preferences
+    @classmethod
+    def cached_preference(cls, name):
+        """Reads the preference through preference_cache. Only use it for properties with update = reset_preference_cache."""
+        if name not in preference_cache:
+            preference_cache[name] = getattr(cls.preferences(), name)
+        return preference_cache[name]
+    @classmethod
     def get_cfg_cache_path(cls):
-        return Path(bpy.context.preferences.addons[__package__].preferences.cfg_cache_path)
+        return cached_path(cls.preferences().cfg_cache_path)
+    @classmethod
+    def get_prop_cache_path(cls):
+        return cached_path(cls.preferences().prop_cache_path)
     @classmethod
     def get_path_to_rda_folder(cls):
-        return Path(bpy.context.preferences.addons[__package__].preferences.path_to_rda_folder)
+        return cached_path(cls.cached_preference("path_to_rda_folder"))
     @classmethod
     def get_path_to_rdm4(cls):
-        return Path(bpy.context.preferences.addons[__package__].preferences.path_to_rdm4)
+        return cached_path(cls.preferences().path_to_rdm4)
     @classmethod
     def get_path_to_texconv(cls):
-        return Path(bpy.context.preferences.addons[__package__].preferences.path_to_texconv)
+        return cached_path(cls.preferences().path_to_texconv)
     @classmethod
     def get_path_to_fc_converter(cls):
-        return Path(bpy.context.preferences.addons[__package__].preferences.path_to_fc_converter)
+        return cached_path(cls.preferences().path_to_fc_converter)
     @classmethod
     def get_texture_quality(cls):
-        return bpy.context.preferences.addons[__package__].preferences.texture_quality
+        return cls.cached_preference("texture_quality")
+    @classmethod
+    def get_texture_quality_suffix(cls):
+        return TEXTURE_QUALITY_SUFFIXES[cls.get_texture_quality()]
     @classmethod
     def splines_enabled(cls):
-        return bpy.context.preferences.addons[__package__].preferences.enable_splines
+        return cls.preferences().enable_splines
     @classmethod
     def mirror_models(cls):
-        return bpy.context.preferences.addons[__package__].preferences.mirror_models_bool
+        return cls.cached_preference("mirror_models_bool")
     @classmethod
     def turn_sequences_into_blender_objects(cls):
-        return bpy.context.preferences.addons[__package__].preferences.sequences_as_blender_objects
+        return cls.cached_preference("sequences_as_blender_objects")
     @classmethod
     def cfg_cache_probability(cls):
-        return bpy.context.preferences.addons[__package__].preferences.cfg_cache_probability_float
+        return cls.preferences().cfg_cache_probability_float
+    @classmethod
+    def should_cache_cfg(cls):
+        """Samples whether a loaded .cfg should be cached. Only draws a random number for probabilities between 0 and 1."""
+        probability = cls.cfg_cache_probability()
+        if probability <= 0.0:
+            return False
+        if probability >= 1.0:
+            return True
+        return random.random() < probability
     @classmethod
     def cfg_cache_loading_enabled(cls):
-        return bpy.context.preferences.addons[__package__].preferences.cfg_cache_loading_enabled_bool
+        return cls.preferences().cfg_cache_loading_enabled_bool
+    @classmethod
+    def debug_output_enabled(cls):
+        return cls.cached_preference("debug_output_bool")
 
 classes = (
     IO_AnnocfgPreferences,
@@ -145,6 +214,7 @@ classes = (
 
 
 def register():
+    clear_preference_cache()
     from bpy.utils import register_class
     for cls in classes:
         register_class(cls)
@@ -157,6 +227,7 @@ def register():
 
 
 def unregister():
+    clear_preference_cache()
     from bpy.utils import unregister_class
     for cls in classes:
         unregister_class(cls)
@@ -1,6 +1,7 @@
 #from lxml import etree
 import xml.etree.ElementTree as etree
 from pathlib import Path
+import copy
 
 from . import feedback_enums
 
@@ -19,28 +20,68 @@ SEQUENCE_ID_BY_NAME = {"none":-1, "idle01":1000, "idle02":1001, "idle03":1002, "
     "misswater":2410, "missland":2411, "work07":3006, "work08":3007, "work09":3008, "work10":3009, "work11":3020, "work12":3021, "work13":3022, \
     "work14":3023, "work15":3024, "work16":3025, "work17":3026, "work18":3027, "work19":3028}
 
+SEQUENCE_ID_STRING_BY_NAME = {name: str(sequence_id) for name, sequence_id in SEQUENCE_ID_BY_NAME.items()}
+
+#Constant parts of the sequence definition, parsed once and copied for every feedback config.
+LOOP0_TEMPLATE = etree.fromstring(
+    "<Loop0><hasValue>1</hasValue>"
+    "<DefaultState><DummyName/><StartDummyGroup/><DummyId>0</DummyId><SequenceID>-1</SequenceID><Visible>1</Visible>"
+    "<FadeVisibility>1</FadeVisibility><ResetToDefaultEveryLoop>1</ResetToDefaultEveryLoop><ForceSequenceRestart>0</ForceSequenceRestart></DefaultState>"
+    "<StartDummyGroup/>"
+    "<ElementContainer><Elements><i><hasValue>1</hasValue><elementType>9</elementType><m_MinScaleFactor/><m_MaxScaleFactor/></i></Elements></ElementContainer>"
+    "</Loop0>"
+)
+LOOP1_TEMPLATE = etree.fromstring(
+    "<Loop1><hasValue>1</hasValue>"
+    "<DefaultState><DummyName/><StartDummyGroup/><DummyId/><SequenceID>-1</SequenceID><Visible>1</Visible>"
+    "<FadeVisibility>1</FadeVisibility><ResetToDefaultEveryLoop>1</ResetToDefaultEveryLoop><ForceSequenceRestart>0</ForceSequenceRestart></DefaultState>"
+    "<ElementContainer><Elements/></ElementContainer>"
+    "</Loop1>"
+)
+
+DUMMY_GROUP_TEMPLATE = etree.fromstring("<i><hasValue>1</hasValue><Name/><Id/><Groups/><Dummies/></i>")
+
+#Constant CDATA payloads of the cf7 format.
+WALK_DUMMY_GROUP = "CDATA[12 -1 -1 -1]"
+VALID_SEQUENCE_IDS = "CDATA[8 0 1]"
+
+#Boolean property values as the cf7 expects them.
+BOOLEAN_TEXTS = {"True": "1", "False": "0"}
+
 def get_sequence(sequence):
-    return str(SEQUENCE_ID_BY_NAME.get(sequence, -1))
+    return SEQUENCE_ID_STRING_BY_NAME.get(sequence, "-1")
 
 def get_text(node, query, default = ""):
-    if node.find(query) is not None:
-        if node.find(query).text is None or node.find(query).text == "None":
+    found = node.find(query)
+    if found is not None:
+        if found.text is None or found.text == "None":
             return ""
-        return node.find(query).text
+        return found.text
     return default
 
 def get_required_text(node, query):
-    if node.find(query) is not None:
-        if node.find(query).text is None or node.find(query).text == "None":
+    found = node.find(query)
+    if found is not None:
+        if found.text is None or found.text == "None":
             return ""
-        return node.find(query).text
+        return found.text
+    raise Exception(f"Missing node {query} in Feedback")
+
+def get_child_texts(node):
+    """Maps the tag of each direct child to its text like get_text does. The first child wins for repeated tags, like in find."""
+    return {child.tag: "" if child.text is None or child.text == "None" else child.text for child in reversed(node)}
+
+def get_required_field(fields, query):
+    if query in fields:
+        return fields[query]
     raise Exception(f"Missing node {query} in Feedback")
 
 
 
 class FeedbackConfig():
-    property_values = {"Description":"", "IgnoreRootObjectXZRotation":"0", "IsAlwaysVisibleActor":"0", "ApplyScaleToMovementSpeed":"1", "ActorCount":"1", \
-        "MaxActorCount":"1", "CreateChance":"100", "BoneLink":"NoLink", "RenderFlags":"0", "MultiplyActorByDummyCount":None, "IgnoreForceActorVariation":"0", "IgnoreDistanceScale":"0"}
+    #(name, default value) in export order. The values of an instance are stored in a list of the same order.
+    property_values = (("Description", ""), ("IgnoreRootObjectXZRotation", "0"), ("IsAlwaysVisibleActor", "0"), ("ApplyScaleToMovementSpeed", "1"), ("ActorCount", "1"), \
+        ("MaxActorCount", "1"), ("CreateChance", "100"), ("BoneLink", "NoLink"), ("RenderFlags", "0"), ("MultiplyActorByDummyCount", None), ("IgnoreForceActorVariation", "0"), ("IgnoreDistanceScale", "0"))
     def __init__(self, feedback_config_node, feedback_encoding):
         self.node = feedback_config_node
         self.feedback_encoding = feedback_encoding
@@ -52,25 +93,28 @@ class FeedbackConfig():
         self.extract_sequence()
 
     def extract_properties(self):
-        self.properties = {}
-        for prop, default_value in FeedbackConfig.property_values.items():
-            value = get_text(self.node, prop, default_value)
-            if value == "True":
-                value = "1"
-            if value == "False":
-                value = "0"
-            self.properties[prop] = value
+        self.properties = []
+        fields = get_child_texts(self.node)
+        for prop, default_value in FeedbackConfig.property_values:
+            if prop not in fields:
+                self.properties.append(default_value)
+                continue
+            value = fields[prop]
+            self.properties.append(BOOLEAN_TEXTS.get(value, value))
 
     def extract_guid_variations(self):
         self.guid_variations = []
+        full_guids_by_name = feedback_enums.full_guids_by_name
         for guid_node in self.node.find("GUIDVariationList").findall("GUID"):
             guid = guid_node.text
-            if guid in feedback_enums.full_guids_by_name:
-                guid = str(feedback_enums.full_guids_by_name[guid])
-            if guid.isnumeric():
+            if guid in full_guids_by_name:
+                guid = str(full_guids_by_name[guid])
+            if guid.isdigit():
                 self.guid_variations.append(guid)
             else:
                 print("Warning: Invalid GUID: ", guid)
+        #Each entry is a guid followed by -1, 8 bytes per entry.
+        self.guid_variations_string = f"CDATA[{8 * len(self.guid_variations)} {' '.join(guid + ' -1' for guid in self.guid_variations)}]"
     
     def extract_scale(self):
         scale_node = self.node.find("Scale")
@@ -81,14 +125,16 @@ class FeedbackConfig():
 
     def extract_sequence(self):
         self.sequence_elements = []
+        sequence_element_nodes = self.node.find("SequenceElements")
         if self.start_dummy_group != "":
             #For more than one person, the only option seems to be this special element type 12. Format CDATA[4 * len(seq) seq]
             #Example: <m_SequenceIds>CDATA[20 1000 1001 1040 1010 3000]</m_SequenceIds>
             #We use the sequence_ids of ALL IdleSequences specified in here.
             sequence_ids = []
-            for sequence_element_node in list(self.node.find("SequenceElements")):
+            for sequence_element_node in sequence_element_nodes:
                 if sequence_element_node.tag == "IdleAnimation":
-                    seq_id = get_sequence(get_required_text(sequence_element_node, 'm_IdleSequenceID'))
+                    fields = get_child_texts(sequence_element_node)
+                    seq_id = get_sequence(get_required_field(fields, 'm_IdleSequenceID'))
                     sequence_ids.append(seq_id)
             element = etree.Element("i")
             etree.SubElement(element, "m_SequenceIds").text = f"CDATA[{4*len(sequence_ids)} {' '.join(sequence_ids)}]"
@@ -100,58 +146,77 @@ class FeedbackConfig():
             etree.SubElement(element, "MaxPlayTime").text = "0"
             self.sequence_elements.append(element)
             return
-        for sequence_element_node in list(self.node.find("SequenceElements")):
+        for sequence_element_node in sequence_element_nodes:
             element = etree.Element("i")
             etree.SubElement(element, "hasValue").text = "1"
-            if sequence_element_node.tag == "IdleAnimation":
-                # if self.start_dummy_group == "":
-                etree.SubElement(element, "elementType").text = "1"
-                etree.SubElement(element, "m_IdleSequenceID").text = get_sequence(get_required_text(sequence_element_node, "m_IdleSequenceID"))
-                etree.SubElement(element, "ResetStartTime").text = "0"
-                # else:
-                #     etree.SubElement(element, "elementType").text = "12"
-                #     etree.SubElement(element, "m_SequenceIds").text = f"CDATA[4 {get_sequence(get_required_text(sequence_element_node, 'm_IdleSequenceID'))}]"
-                etree.SubElement(element, "MinPlayCount").text = get_required_text(sequence_element_node, "MinPlayCount")
-                etree.SubElement(element, "MaxPlayCount").text = get_required_text(sequence_element_node, "MaxPlayCount")
-                etree.SubElement(element, "MinPlayTime").text = "0"
-                etree.SubElement(element, "MaxPlayTime").text = "0"
-            if sequence_element_node.tag == "TimedIdleAnimation":
-                etree.SubElement(element, "elementType").text = "1"
-                etree.SubElement(element, "m_IdleSequenceID").text = get_sequence(get_required_text(sequence_element_node, "m_IdleSequenceID"))
-                etree.SubElement(element, "MinPlayCount").text = "0"
-                etree.SubElement(element, "MaxPlayCount").text = "0"
-                etree.SubElement(element, "MinPlayTime").text = get_required_text(sequence_element_node, "MinPlayTime")
-                etree.SubElement(element, "MaxPlayTime").text = get_required_text(sequence_element_node, "MaxPlayTime")
-                etree.SubElement(element, "ResetStartTime").text = "0"
-            if sequence_element_node.tag == "Walk":
-                etree.SubElement(element, "elementType").text = "0"
-                etree.SubElement(element, "WalkSequence").text = get_sequence(get_required_text(sequence_element_node, "WalkSequence"))
-                etree.SubElement(element, "TargetDummy").text = get_required_text(sequence_element_node, "TargetDummy")
-                etree.SubElement(element, "TargetDummyId").text = self.feedback_encoding.dummy_id_by_name.get(get_required_text(sequence_element_node, "TargetDummy"), "0")
-                etree.SubElement(element, "SpeedFactorF").text = get_required_text(sequence_element_node, "SpeedFactorF")
-                etree.SubElement(element, "StartDummy")
-                etree.SubElement(element, "StartDummyId").text = "0"
-                etree.SubElement(element, "WalkFromCurrentPosition").text = "1"
-                etree.SubElement(element, "UseTargetDummyDirection").text = "1"
-                etree.SubElement(element, "DummyGroup").text = "CDATA[12 -1 -1 -1]"
-            if sequence_element_node.tag == "Wait":
-                etree.SubElement(element, "elementType").text = "2"
-                etree.SubElement(element, "MinTime").text = get_required_text(sequence_element_node, "MinTime")
-                etree.SubElement(element, "MaxTime").text = get_required_text(sequence_element_node, "MaxTime")
-            if sequence_element_node.tag == "TurnAngle":
-                etree.SubElement(element, "elementType").text = "10"
-                etree.SubElement(element, "TurnAngleF").text = get_required_text(sequence_element_node, "TurnAngleF") #in radians
-                etree.SubElement(element, "TurnSequence").text = get_required_text(sequence_element_node, "TurnSequence")
-                etree.SubElement(element, "TurnToDummy")
-                etree.SubElement(element, "TurnToDummyID").text = "0"
-            if sequence_element_node.tag == "TurnToDummy":
-                etree.SubElement(element, "elementType").text = "10"
-                etree.SubElement(element, "TurnAngleF").text = "0"
-                etree.SubElement(element, "TurnSequence").text = get_required_text(sequence_element_node, "TurnSequence")
-                etree.SubElement(element, "TurnToDummy").text = get_required_text(sequence_element_node, "TurnToDummy")
-                etree.SubElement(element, "TurnToDummyID").text = self.feedback_encoding.dummy_id_by_name.get(get_required_text(sequence_element_node, "TurnToDummy"), "0")
+            convert = FeedbackConfig.sequence_element_converters.get(sequence_element_node.tag)
+            if convert is not None:
+                convert(self, element, get_child_texts(sequence_element_node))
             self.sequence_elements.append(element)
 
+    def convert_idle_animation(self, element, fields):
+        # if self.start_dummy_group == "":
+        etree.SubElement(element, "elementType").text = "1"
+        etree.SubElement(element, "m_IdleSequenceID").text = get_sequence(get_required_field(fields, "m_IdleSequenceID"))
+        etree.SubElement(element, "ResetStartTime").text = "0"
+        # else:
+        #     etree.SubElement(element, "elementType").text = "12"
+        #     etree.SubElement(element, "m_SequenceIds").text = f"CDATA[4 {get_sequence(get_required_field(fields, 'm_IdleSequenceID'))}]"
+        etree.SubElement(element, "MinPlayCount").text = get_required_field(fields, "MinPlayCount")
+        etree.SubElement(element, "MaxPlayCount").text = get_required_field(fields, "MaxPlayCount")
+        etree.SubElement(element, "MinPlayTime").text = "0"
+        etree.SubElement(element, "MaxPlayTime").text = "0"
+
+    def convert_timed_idle_animation(self, element, fields):
+        etree.SubElement(element, "elementType").text = "1"
+        etree.SubElement(element, "m_IdleSequenceID").text = get_sequence(get_required_field(fields, "m_IdleSequenceID"))
+        etree.SubElement(element, "MinPlayCount").text = "0"
+        etree.SubElement(element, "MaxPlayCount").text = "0"
+        etree.SubElement(element, "MinPlayTime").text = get_required_field(fields, "MinPlayTime")
+        etree.SubElement(element, "MaxPlayTime").text = get_required_field(fields, "MaxPlayTime")
+        etree.SubElement(element, "ResetStartTime").text = "0"
+
+    def convert_walk(self, element, fields):
+        etree.SubElement(element, "elementType").text = "0"
+        etree.SubElement(element, "WalkSequence").text = get_sequence(get_required_field(fields, "WalkSequence"))
+        etree.SubElement(element, "TargetDummy").text = get_required_field(fields, "TargetDummy")
+        etree.SubElement(element, "TargetDummyId").text = self.feedback_encoding.dummy_id_by_name.get(get_required_field(fields, "TargetDummy"), "0")
+        etree.SubElement(element, "SpeedFactorF").text = get_required_field(fields, "SpeedFactorF")
+        etree.SubElement(element, "StartDummy")
+        etree.SubElement(element, "StartDummyId").text = "0"
+        etree.SubElement(element, "WalkFromCurrentPosition").text = "1"
+        etree.SubElement(element, "UseTargetDummyDirection").text = "1"
+        etree.SubElement(element, "DummyGroup").text = WALK_DUMMY_GROUP
+
+    def convert_wait(self, element, fields):
+        etree.SubElement(element, "elementType").text = "2"
+        etree.SubElement(element, "MinTime").text = get_required_field(fields, "MinTime")
+        etree.SubElement(element, "MaxTime").text = get_required_field(fields, "MaxTime")
+
+    def convert_turn_angle(self, element, fields):
+        etree.SubElement(element, "elementType").text = "10"
+        etree.SubElement(element, "TurnAngleF").text = get_required_field(fields, "TurnAngleF") #in radians
+        etree.SubElement(element, "TurnSequence").text = get_required_field(fields, "TurnSequence")
+        etree.SubElement(element, "TurnToDummy")
+        etree.SubElement(element, "TurnToDummyID").text = "0"
+
+    def convert_turn_to_dummy(self, element, fields):
+        etree.SubElement(element, "elementType").text = "10"
+        etree.SubElement(element, "TurnAngleF").text = "0"
+        etree.SubElement(element, "TurnSequence").text = get_required_field(fields, "TurnSequence")
+        etree.SubElement(element, "TurnToDummy").text = get_required_field(fields, "TurnToDummy")
+        etree.SubElement(element, "TurnToDummyID").text = self.feedback_encoding.dummy_id_by_name.get(get_required_field(fields, "TurnToDummy"), "0")
+
+    #Unknown tags are exported as an element with only hasValue.
+    sequence_element_converters = {
+        "IdleAnimation": convert_idle_animation,
+        "TimedIdleAnimation": convert_timed_idle_animation,
+        "Walk": convert_walk,
+        "Wait": convert_wait,
+        "TurnAngle": convert_turn_angle,
+        "TurnToDummy": convert_turn_to_dummy,
+    }
+
     def export_to_cf7(self, feedback_config_node, feedback_loop_mode):
         etree.SubElement(feedback_config_node, "hasValue").text = "1"
         etree.SubElement(feedback_config_node, "MainObject").text = "0"
@@ -165,58 +230,36 @@ class FeedbackConfig():
         self.export_sequence_definition(sequence_definition_node)
 
     def export_properties(self, feedback_config_node):
-        for prop, value in self.properties.items():
+        for (prop, _), value in zip(FeedbackConfig.property_values, self.properties):
             prop_element = etree.SubElement(feedback_config_node, prop)
             if value is not None:
                 prop_element.text = str(value)
 
     def export_guid_variations(self, feedback_config_node):
         asset_variation_node = etree.SubElement(feedback_config_node, "AssetVariationList")
-        guid_variation_bytes = 8 * len(self.guid_variations)
-        guid_variations_string = f"CDATA[{guid_variation_bytes} {' '.join([guid + ' -1' for guid in self.guid_variations])}]"
-        etree.SubElement(asset_variation_node, "GuidVariationList").text = guid_variations_string
+        etree.SubElement(asset_variation_node, "GuidVariationList").text = self.guid_variations_string
         etree.SubElement(asset_variation_node, "AssetGroupNames")
 
     def export_sequence_definition(self, feedback_config_node):
         etree.SubElement(feedback_config_node, "hasValue").text = "1"
         
         #Loop 0 - mostly hardcoded
-        loop0_node = etree.SubElement(feedback_config_node, "Loop0")
-        etree.SubElement(loop0_node, "hasValue").text = "1"
-        loop0_default_state_node = etree.SubElement(loop0_node, "DefaultState")
-        start_dummy_group_node = etree.SubElement(loop0_node, "StartDummyGroup")
-        etree.SubElement(loop0_default_state_node, "DummyName")
-        etree.SubElement(loop0_default_state_node, "StartDummyGroup")
-        etree.SubElement(loop0_default_state_node, "DummyId").text = "0"
-        etree.SubElement(loop0_default_state_node, "SequenceID").text = "-1"
-        etree.SubElement(loop0_default_state_node, "Visible").text = "1"
-        etree.SubElement(loop0_default_state_node, "FadeVisibility").text = "1"
-        etree.SubElement(loop0_default_state_node, "ResetToDefaultEveryLoop").text = "1"
-        etree.SubElement(loop0_default_state_node, "ForceSequenceRestart").text = "0"
-        loop_0_container = etree.SubElement(loop0_node, "ElementContainer")
-        loop_0_elements = etree.SubElement(loop_0_container, "Elements")
-        loop_0_element1 = etree.SubElement(loop_0_elements, "i")
-        etree.SubElement(loop_0_element1, "hasValue").text = "1"
-        etree.SubElement(loop_0_element1, "elementType").text = "9"
-        etree.SubElement(loop_0_element1, "m_MinScaleFactor").text = self.min_scale
-        etree.SubElement(loop_0_element1, "m_MaxScaleFactor").text = self.max_scale
+        loop0_node = copy.deepcopy(LOOP0_TEMPLATE)
+        loop_0_element1 = loop0_node.find("ElementContainer/Elements/i")
+        loop_0_element1.find("m_MinScaleFactor").text = self.min_scale
+        loop_0_element1.find("m_MaxScaleFactor").text = self.max_scale
+        feedback_config_node.append(loop0_node)
         
         #loop 1
-        loop1_node = etree.SubElement(feedback_config_node, "Loop1")
-        etree.SubElement(loop1_node, "hasValue").text = "1"
-        loop1_default_state_node = etree.SubElement(loop1_node, "DefaultState")
-        etree.SubElement(loop1_default_state_node, "DummyName").text = self.default_state_dummy
-        etree.SubElement(loop1_default_state_node, "StartDummyGroup").text = self.start_dummy_group
-        etree.SubElement(loop1_default_state_node, "DummyId").text = self.feedback_encoding.dummy_id_by_name.get(self.default_state_dummy, "0")
-        etree.SubElement(loop1_default_state_node, "SequenceID").text = "-1"
-        etree.SubElement(loop1_default_state_node, "Visible").text = "1"
-        etree.SubElement(loop1_default_state_node, "FadeVisibility").text = "1"
-        etree.SubElement(loop1_default_state_node, "ResetToDefaultEveryLoop").text = "1"
-        etree.SubElement(loop1_default_state_node, "ForceSequenceRestart").text = "0"
-        loop_1_container = etree.SubElement(loop1_node, "ElementContainer")
-        loop_1_elements = etree.SubElement(loop_1_container, "Elements")
+        loop1_node = copy.deepcopy(LOOP1_TEMPLATE)
+        loop1_default_state_node = loop1_node.find("DefaultState")
+        loop1_default_state_node.find("DummyName").text = self.default_state_dummy
+        loop1_default_state_node.find("StartDummyGroup").text = self.start_dummy_group
+        loop1_default_state_node.find("DummyId").text = self.feedback_encoding.dummy_id_by_name.get(self.default_state_dummy, "0")
+        loop_1_elements = loop1_node.find("ElementContainer/Elements")
         for element in self.sequence_elements:
             loop_1_elements.append(element)
+        feedback_config_node.append(loop1_node)
 
 class SimpleAnnoFeedbackEncoding():
     def __init__(self, root_node):
@@ -290,18 +333,18 @@ class SimpleAnnoFeedbackEncoding():
         for feedback_config in self.feedback_configs:
             feedback_config_node = etree.SubElement(feedback_configs_node, "i")
             feedback_config.export_to_cf7(feedback_config_node, feedback_loop_mode)
-        etree.SubElement(feedback_definition_node, "ValidSequenceIDs").text = "CDATA[8 0 1]"
+        etree.SubElement(feedback_definition_node, "ValidSequenceIDs").text = VALID_SEQUENCE_IDS
 
         return cf7root
     
     def write_as_cf7(self, filename, feedback_loop_mode = 1):
         cf7root = self.as_cf7(feedback_loop_mode)
         etree.indent(cf7root, space=" ")
-        cf7tree_string = etree.tostring(cf7root, encoding='unicode', method='xml')
-
-        cf7tree_string = cf7tree_string.replace("</cf7_imaginary_root>", "").replace("<cf7_imaginary_root>","")
+        #The imaginary root is not written, only its children (including their tails).
         with open(str(filename.with_suffix(".cf7")), 'w') as f:
-            f.write(cf7tree_string)
+            f.write(cf7root.text)
+            for child in cf7root:
+                etree.ElementTree(child).write(f, encoding='unicode', method='xml')
 
     def export_dummies(self, dummy_root):
         etree.SubElement(dummy_root, "hasValue").text = "1"
@@ -314,11 +357,10 @@ class SimpleAnnoFeedbackEncoding():
             self.export_dummy_group(dummy_group_name, group_item_node)
     
     def export_dummy_group(self, dummy_group_name, group_item_node):
-        etree.SubElement(group_item_node, "hasValue").text = "1"
-        etree.SubElement(group_item_node, "Name").text = dummy_group_name
-        etree.SubElement(group_item_node, "Id").text = self.dummy_id_by_name[dummy_group_name]
-        etree.SubElement(group_item_node, "Groups")
-        dummy_list_node = etree.SubElement(group_item_node, "Dummies")
+        group_item_node.extend(copy.deepcopy(DUMMY_GROUP_TEMPLATE))
+        group_item_node.find("Name").text = dummy_group_name
+        group_item_node.find("Id").text = self.dummy_id_by_name[dummy_group_name]
+        dummy_list_node = group_item_node.find("Dummies")
         for dummy_node in self.dummy_groups[dummy_group_name]:
             dummy_node.tag = "i"
             dummy_list_node.append(dummy_node)
\ No newline at end of file
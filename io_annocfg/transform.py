@@ -6,10 +6,47 @@ import xml.etree.ElementTree as ET
 from pathlib import Path
 from typing import Tuple, List, NewType, Any, Union, Dict, Optional, TypeVar, Type
 import bmesh
+import numpy as np
 from math import radians
 from .prefs import IO_AnnocfgPreferences
 from .utils import *
 
+def permute(values, permutation, signs):
+    return tuple(sign * values[index] for index, sign in zip(permutation, signs))
+
+#Index permutation and signs of location and rotation (wxyz) per conversion direction, keyed by mirror_models.
+#Scale and euler rotation only swap y and z.
+TO_BLENDER_COORDS = {
+    True:  ((0, 2, 1), (-1, -1, 1), (0, 1, 3, 2), (1, 1, 1, -1)),
+    False: ((0, 2, 1), (1, -1, 1),   (0, 1, 3, 2), (1, 1, 1, 1)),
+}
+TO_ANNO_COORDS = {
+    True:  ((0, 2, 1), (-1, 1, -1), (0, 1, 3, 2), (1, 1, -1, 1)),
+    False: ((0, 2, 1), (1, 1, -1),  (0, 1, 3, 2), (1, 1, 1, 1)),
+}
+SWAP_YZ = (0, 2, 1)
+NO_SIGNS = (1, 1, 1)
+
+#Attribute and index of each transform component, see Transform.get_component_value.
+COMPONENTS_BY_NAME = {
+    "location.x": ("location", 0),
+    "location.y": ("location", 1),
+    "location.z": ("location", 2),
+    
+    "rotation.w": ("rotation", 0),
+    "rotation.x": ("rotation", 1),
+    "rotation.y": ("rotation", 2),
+    "rotation.z": ("rotation", 3),
+    
+    "rotation_euler.x": ("rotation_euler", 0),
+    "rotation_euler.y": ("rotation_euler", 1),
+    "rotation_euler.z": ("rotation_euler", 2),
+    
+    "scale.x": ("scale", 0),
+    "scale.y": ("scale", 1),
+    "scale.z": ("scale", 2),
+}
+
 class Transform:
     """
     Parses an xml tree node for transform operations, stores them and can apply them to a blender object.
@@ -23,56 +60,51 @@ class Transform:
         self.anno_coords = anno_coords
         
     def get_component_value(self, component_name: str) -> float:
-        component_by_name = {
-            "location.x": self.location[0],
-            "location.y": self.location[1],
-            "location.z": self.location[2],
-            
-            "rotation.w": self.rotation[0],
-            "rotation.x": self.rotation[1],
-            "rotation.y": self.rotation[2],
-            "rotation.z": self.rotation[3],
-            
-            "rotation_euler.x": self.rotation_euler[0],
-            "rotation_euler.y": self.rotation_euler[1],
-            "rotation_euler.z": self.rotation_euler[2],
-            
-            "scale.x": self.scale[0],
-            "scale.y": self.scale[1],
-            "scale.z": self.scale[2],
-        }
-        return component_by_name[component_name]
+        attribute, index = COMPONENTS_BY_NAME[component_name]
+        return getattr(self, attribute)[index]
         
-    def get_component_from_node(self, node: ET.Element, transform_paths: Dict[str, str], component: str, default = 0.0) -> float:
+    def get_component_from_node(self, node: ET.Element, transform_paths: Dict[str, str], component: str, default = 0.0, children_by_tag = None) -> float:
         query = transform_paths.get(component, None)
         if not query:
             return default
+        #Plain tag names are taken from children_by_tag, which from_node fills in a single walk over the node.
+        if children_by_tag is not None and "/" not in query and "[" not in query:
+            subnode = children_by_tag.pop(query, None)
+            if subnode is None:
+                return default
+            node.remove(subnode)
+            if subnode.text is None:
+                return default
+            return float(subnode.text)
         value = float(get_text_and_delete(node, query, str(default)))
         return value
         
     @classmethod
     def from_node(cls, node: ET.Element, transform_paths, enforce_equal_scale: bool, euler_rotation: bool = False) -> Transform:
-        instance = cls()
-        instance.location[0] = instance.get_component_from_node(node, transform_paths, "location.x")
-        instance.location[1] = instance.get_component_from_node(node, transform_paths, "location.y")
-        instance.location[2] = instance.get_component_from_node(node, transform_paths, "location.z")
+        instance = cls([0,0,0], [1,0,0,0], [1,1,1])
+        children_by_tag = {}
+        for child in reversed(node):
+            children_by_tag[child.tag] = child
+        instance.location[0] = instance.get_component_from_node(node, transform_paths, "location.x", children_by_tag = children_by_tag)
+        instance.location[1] = instance.get_component_from_node(node, transform_paths, "location.y", children_by_tag = children_by_tag)
+        instance.location[2] = instance.get_component_from_node(node, transform_paths, "location.z", children_by_tag = children_by_tag)
         
-        instance.scale[0] = instance.get_component_from_node(node, transform_paths, "scale.x", 1.0)
-        instance.scale[1] = instance.get_component_from_node(node, transform_paths, "scale.y", 1.0)
-        instance.scale[2] = instance.get_component_from_node(node, transform_paths, "scale.z", 1.0)
+        instance.scale[0] = instance.get_component_from_node(node, transform_paths, "scale.x", 1.0, children_by_tag = children_by_tag)
+        instance.scale[1] = instance.get_component_from_node(node, transform_paths, "scale.y", 1.0, children_by_tag = children_by_tag)
+        instance.scale[2] = instance.get_component_from_node(node, transform_paths, "scale.z", 1.0, children_by_tag = children_by_tag)
         if enforce_equal_scale:
             instance.scale[1] = instance.scale[0]
             instance.scale[2] = instance.scale[1]
         
         if not euler_rotation:        
-            instance.rotation[0] = instance.get_component_from_node(node, transform_paths, "rotation.w", 1.0)
-            instance.rotation[1] = instance.get_component_from_node(node, transform_paths, "rotation.x")
-            instance.rotation[2] = instance.get_component_from_node(node, transform_paths, "rotation.y")
-            instance.rotation[3] = instance.get_component_from_node(node, transform_paths, "rotation.z")
+            instance.rotation[0] = instance.get_component_from_node(node, transform_paths, "rotation.w", 1.0, children_by_tag = children_by_tag)
+            instance.rotation[1] = instance.get_component_from_node(node, transform_paths, "rotation.x", children_by_tag = children_by_tag)
+            instance.rotation[2] = instance.get_component_from_node(node, transform_paths, "rotation.y", children_by_tag = children_by_tag)
+            instance.rotation[3] = instance.get_component_from_node(node, transform_paths, "rotation.z", children_by_tag = children_by_tag)
         else:
-            instance.rotation_euler[0] = instance.get_component_from_node(node, transform_paths, "rotation_euler.x")
-            instance.rotation_euler[1] = instance.get_component_from_node(node, transform_paths, "rotation_euler.y")
-            instance.rotation_euler[2] = instance.get_component_from_node(node, transform_paths, "rotation_euler.z")
+            instance.rotation_euler[0] = instance.get_component_from_node(node, transform_paths, "rotation_euler.x", children_by_tag = children_by_tag)
+            instance.rotation_euler[1] = instance.get_component_from_node(node, transform_paths, "rotation_euler.y", children_by_tag = children_by_tag)
+            instance.rotation_euler[2] = instance.get_component_from_node(node, transform_paths, "rotation_euler.z", children_by_tag = children_by_tag)
             instance.euler_rotation = True
             
         instance.anno_coords = True
@@ -95,28 +127,27 @@ class Transform:
     def convert_to_blender_coords(self):
         if not self.anno_coords:
             return
-        if IO_AnnocfgPreferences.mirror_models():
-            self.location = (-self.location[0], -self.location[2], self.location[1])
-            self.rotation = (self.rotation[0], self.rotation[1], self.rotation[3], -self.rotation[2])
-        else:     
-            self.location = (self.location[0], -self.location[2], self.location[1])
-            self.rotation = (self.rotation[0], self.rotation[1], self.rotation[3], self.rotation[2])
-        self.rotation_euler = (self.rotation_euler[0], self.rotation_euler[2], self.rotation_euler[1])
-        self.scale = (self.scale[0], self.scale[2], self.scale[1])
-        
+        self.location, self.rotation, self.rotation_euler, self.scale = self.blender_coords()
         self.anno_coords = False
+    
+    def blender_coords(self):
+        """Returns location, rotation, rotation_euler and scale converted from anno to blender coordinates without changing the transform."""
+        location_permutation, location_signs, rotation_permutation, rotation_signs = TO_BLENDER_COORDS[IO_AnnocfgPreferences.mirror_models()]
+        return (
+            permute(self.location, location_permutation, location_signs),
+            permute(self.rotation, rotation_permutation, rotation_signs),
+            permute(self.rotation_euler, SWAP_YZ, NO_SIGNS),
+            permute(self.scale, SWAP_YZ, NO_SIGNS),
+        )
 
     def convert_to_anno_coords(self):
         if self.anno_coords:
             return
-        if IO_AnnocfgPreferences.mirror_models():
-            self.location = (-self.location[0], self.location[2], -self.location[1])
-            self.rotation = (self.rotation[0], self.rotation[1], -self.rotation[3], self.rotation[2])
-        else:     
-            self.location = (self.location[0], self.location[2], -self.location[1])
-            self.rotation = (self.rotation[0], self.rotation[1], self.rotation[3], self.rotation[2])
-        self.rotation_euler = (self.rotation_euler[0], self.rotation_euler[2], self.rotation_euler[1])
-        self.scale = (self.scale[0], self.scale[2], self.scale[1])
+        location_permutation, location_signs, rotation_permutation, rotation_signs = TO_ANNO_COORDS[IO_AnnocfgPreferences.mirror_models()]
+        self.location = permute(self.location, location_permutation, location_signs)
+        self.rotation = permute(self.rotation, rotation_permutation, rotation_signs)
+        self.rotation_euler = permute(self.rotation_euler, SWAP_YZ, NO_SIGNS)
+        self.scale = permute(self.scale, SWAP_YZ, NO_SIGNS)
         
         self.anno_coords
     
@@ -126,29 +157,38 @@ class Transform:
             return
         if not obj.data or not hasattr(obj.data, "vertices"):
             return
-        for v in obj.data.vertices:
-            v.co.x *= -1.0
+        vertices = obj.data.vertices
+        coordinates = np.empty(len(vertices) * 3, dtype=np.float32)
+        vertices.foreach_get("co", coordinates)
+        coordinates[0::3] *= -1.0
+        vertices.foreach_set("co", coordinates)
         #Inverting normals for import AND Export they are wrong because of scaling on the x axis.
         #Warn people that this will break exports from .blend files made with an earlier version!!!
         mesh = obj.data
+        if hasattr(mesh, "flip_normals"):
+            mesh.flip_normals()
+            mesh.update()
+            return
+        #Older blender versions do not have Mesh.flip_normals.
         bm = bmesh.new()
         bm.from_mesh(mesh) # load bmesh
-        for f in bm.faces:
-             f.normal_flip()
+        bmesh.ops.reverse_faces(bm, faces=bm.faces[:])
         bm.normal_update() # not sure if req'd
         bm.to_mesh(mesh)
         mesh.update()
-        bm.clear() #.. clear before load next
+        bm.free()
     
     def apply_to(self, object):
         if self.anno_coords:
-            self.convert_to_blender_coords()
+            location, rotation, rotation_euler, scale = self.blender_coords()
+        else:
+            location, rotation, rotation_euler, scale = self.location, self.rotation, self.rotation_euler, self.scale
         #self.mirror_mesh(object)
-        object.location = self.location
+        object.location = location
         if not self.euler_rotation:
             object.rotation_mode = "QUATERNION"
-            object.rotation_quaternion = self.rotation
+            object.rotation_quaternion = rotation
         else:
             object.rotation_mode = "XYZ"
-            object.rotation_euler = self.rotation_euler
-        object.scale = self.scale
+            object.rotation_euler = rotation_euler
+        object.scale = scale
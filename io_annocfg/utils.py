@@ -4,25 +4,85 @@ from pathlib import Path
 from .prefs import IO_AnnocfgPreferences
 
 import xml.etree.ElementTree as ET
+import copy
+import os
 import re
+from concurrent.futures import ThreadPoolExecutor
 from typing import Tuple, List, NewType, Any, Union, Dict, Optional, TypeVar, Type
 
+#Resolved absolute paths by (data path, rda folder, mod folder). Only contains paths that exist.
+absolute_path_cache: Dict[Tuple[str, Path, str], Path] = {}
+#Relative paths of all files and folders by their lowercase version, by mod folder, see get_mod_folder_index.
+mod_folder_indices: Dict[str, Dict[str, str]] = {}
+
 def data_path_to_absolute_path(path):
-    path = Path(path)
-    rda_absolute_path = Path(IO_AnnocfgPreferences.get_path_to_rda_folder(), path)
-    if bpy.context.scene.anno_mod_folder == "":
+    rda_folder = IO_AnnocfgPreferences.get_path_to_rda_folder()
+    mod_folder = bpy.context.scene.anno_mod_folder
+    cache_key = (str(path), rda_folder, mod_folder)
+    absolute_path = absolute_path_cache.get(cache_key)
+    if absolute_path is not None:
+        return absolute_path
+    absolute_path = resolve_data_path(Path(path), rda_folder, mod_folder)
+    if absolute_path.exists():
+        absolute_path_cache[cache_key] = absolute_path
+    return absolute_path
+
+def clear_absolute_path_cache():
+    """Called when an import starts, so that files added or removed since the last import are found again."""
+    absolute_path_cache.clear()
+    mod_folder_indices.clear()
+
+def get_mod_folder_index(mod_folder):
+    """Walks the mod folder once, so that resolve_data_path can test for files in it without a stat call per path.
+    The keys are lowercase, because the game and the windows file system do not care about case,
+    the values are the relative paths as they are on disk.
+    """
+    index = mod_folder_indices.get(mod_folder)
+    if index is not None:
+        return index
+    index = {}
+    for dirpath, dirnames, filenames in os.walk(mod_folder):
+        relative_dirpath = os.path.relpath(dirpath, mod_folder)
+        for name in dirnames + filenames:
+            relative_path = Path(relative_dirpath, name).as_posix()
+            index[relative_path.lower()] = relative_path
+    mod_folder_indices[mod_folder] = index
+    return index
+
+def resolve_data_path(path, rda_folder, mod_folder):
+    rda_absolute_path = Path(rda_folder, path)
+    if mod_folder == "":
         return rda_absolute_path
-    mod_absolute_path = Path(bpy.context.scene.anno_mod_folder, path)
-    if mod_absolute_path.exists():
-        return mod_absolute_path
+    mod_folder_index = get_mod_folder_index(mod_folder)
+    #Use the casing from the disk, case sensitive file systems would not find the file otherwise.
+    relative_path = mod_folder_index.get(path.as_posix().lower())
+    if relative_path is not None:
+        return Path(mod_folder, relative_path)
     if rda_absolute_path.exists():
         return rda_absolute_path
     #Maybe it will be used with a different extension, etc. so have a look if the folder exists
-    mod_absolute_path_to_folder = Path(bpy.context.scene.anno_mod_folder, path.parent)
-    if mod_absolute_path_to_folder.exists():
-        return mod_absolute_path
+    relative_parent = mod_folder_index.get(path.parent.as_posix().lower())
+    if relative_parent is not None:
+        return Path(mod_folder, relative_parent, path.name)
     return rda_absolute_path
 
+#Number of bytes read from the start of each file by prefetch_files.
+PREFETCH_BYTES = 1 << 20
+
+def prefetch_files(fullpaths: List[Path], max_workers = 8) -> None:
+    """Reads the start of the given files in a thread pool, so that they are in the OS page cache
+    when blender loads them on the main thread. Missing or unreadable files are ignored.
+    """
+    def read(fullpath):
+        try:
+            with open(fullpath, "rb") as f:
+                f.read(PREFETCH_BYTES)
+        except OSError:
+            pass
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        for _ in executor.map(read, set(fullpaths)):
+            pass
+
 def to_data_path(absolute_path):
     absolute_path = Path(absolute_path)
     rda_path = IO_AnnocfgPreferences.get_path_to_rda_folder()
@@ -36,16 +96,16 @@ def to_data_path(absolute_path):
 
 
 def parse_float_node(node, query, default_value = 0.0):
-    value = default_value
-    if node.find(query) is not None:
-        value = float(node.find(query).text)
-    return value
+    subnode = node.find(query)
+    if subnode is None:
+        return default_value
+    return float(subnode.text)
 
 def get_float(node, query, default_value = 0.0):
-    value = default_value
-    if node.find(query) is not None:
-        value = float(node.find(query).text)
-    return value
+    subnode = node.find(query)
+    if subnode is None:
+        return default_value
+    return float(subnode.text)
 
 
 def is_type(T: type, s: str) -> bool:
@@ -56,11 +116,18 @@ def is_type(T: type, s: str) -> bool:
         return False
 
 def string_to_fitting_type(s: str):
-    if is_type(int, s) and s.isnumeric():
-        return int(s)
-    if is_type(float, s):
+    #Converts at most once per type instead of probing with is_type first.
+    if s is None:
+        return s
+    if s.isnumeric():
+        try:
+            return int(s)
+        except ValueError:
+            pass
+    try:
         return float(s)
-    return s
+    except ValueError:
+        return s
     
 def get_first_or_none(list):
     if list:
@@ -69,16 +136,35 @@ def get_first_or_none(list):
 
 
 def get_text(node: ET.Element, query: str, default_value = "") -> str:
-    if node.find(query) is None:
-        return str(default_value)
-    if node.find(query).text is None:
+    subnode = node.find(query)
+    if subnode is None or subnode.text is None:
         return str(default_value)
-    return node.find(query).text
+    return subnode.text
 
 def get_text_and_delete(node: ET.Element, query: str, default_value = "") -> str:
-    if node.find(query) is None:
+    #Walk down the query once and remember the ancestors, so that emptied ones can be removed without searching them again.
+    parts = query.split("/")
+    chain = [node]
+    for part in parts:
+        subnode = chain[-1].find(part)
+        if subnode is None:
+            break
+        chain.append(subnode)
+    if len(chain) == 1:
         return str(default_value)
+    if len(chain) > len(parts):
+        subnode = chain.pop()
+        chain[-1].remove(subnode)
+        while len(chain) > 1 and len(chain[-1]) == 0:
+            empty_parent = chain.pop()
+            chain[-1].remove(empty_parent)
+        if subnode.text is None:
+            return default_value
+        return subnode.text
+    #The first match of an intermediate step has no match for the rest of the query, let find look at the later ones.
     subnode = node.find(query)
+    if subnode is None:
+        return str(default_value)
     parent = node
     if "/" in query:
         query = query.rsplit("/", maxsplit=1)[0]
@@ -96,8 +182,29 @@ def get_text_and_delete(node: ET.Element, query: str, default_value = "") -> str
         return default_value
     return subnode.text
 
+def write_xml_file(root: ET.Element, filepath) -> None:
+    """Indents the tree below root with tabs and writes it to filepath."""
+    tree = ET.ElementTree(root)
+    ET.indent(tree, space="\t", level=0)
+    tree.write(filepath)
+
+def node_from_template(template: ET.Element, **texts: str) -> ET.Element:
+    """Returns a copy of the pre-parsed template node with the text of the given subnodes replaced.
+
+    Args:
+        template (ET.Element): Parsed template, will not be modified.
+        texts (str): Tag of a direct subnode -> new text.
+
+    Returns:
+        ET.Element: The new node.
+    """
+    node = copy.deepcopy(template)
+    for tag, text in texts.items():
+        node.find(tag).text = text
+    return node
+
 def format_float(value: Union[float, int]):
-    return "{:.6f}".format(value)
+    return f"{value:.6f}"
 
 def find_or_create(parent: ET.Element, simple_query: str) -> ET.Element:
     """Finds or creates the subnode corresponding to the simple query.
@@ -110,18 +217,18 @@ def find_or_create(parent: ET.Element, simple_query: str) -> ET.Element:
     Returns:
         ET.Element: The node.
     """
-    parts = simple_query.split("/", maxsplit = 1)
-    query = parts[0]
-    queried_node = parent.find(query)
-    if queried_node is None:
-        tag = query.split("[")[0]
-        queried_node = ET.SubElement(parent, tag)
-        if "[" in query:
-            condition = query.split("[")[1].replace("]", "")
-            subnode_tag = condition.split("=")[0].strip()
-            subnode_value = condition.split("=")[1].strip().replace('"', '').replace("'", "")
-            ET.SubElement(queried_node, subnode_tag).text = subnode_value
-    if len(parts) > 1:
-        return find_or_create(queried_node, parts[1])
+    queried_node = parent
+    for query in simple_query.split("/"):
+        #Skip the find for nodes without children, which is always the case for the remaining path below a newly created node.
+        subnode = queried_node.find(query) if len(queried_node) > 0 else None
+        if subnode is None:
+            tag = query.split("[")[0]
+            subnode = ET.SubElement(queried_node, tag)
+            if "[" in query:
+                condition = query.split("[")[1].replace("]", "")
+                subnode_tag = condition.split("=")[0].strip()
+                subnode_value = condition.split("=")[1].strip().replace('"', '').replace("'", "")
+                ET.SubElement(subnode, subnode_tag).text = subnode_value
+        queried_node = subnode
     return queried_node
 